@@ -40,6 +40,13 @@ One can read arrays with varying precisions::
     >>> z = f.readReals('f')
 Where the format codes are those used by Python's struct module.
 
+Many records of the same length can be read at once into a 2D array::
+    >>> f = FortranFile('filename')
+    >>> x = f.readRecordArray(1000, 46, 'd')
+and a 2D array can be written with one record for each row::
+    >>> f = FortranFile('filename', mode='w')
+    >>> f.writeRecordArray(x, 'd')
+
 One can change the default endian-ness and header precision::
     >>> f = FortranFile('filename', endian='>', header_prec='l')
 for a file with little-endian data whose record headers are long
@@ -216,7 +223,90 @@ class FortranFile(file):
         for r in reals:
             self.write(struct.pack(_fmt,r))
         self._write_check(length_bytes)
-    
+
+    def _record_dtype(self, ncols, prec):
+        """numpy dtype of a record with ncols numbers and its markers"""
+        if prec in self._real_precisions:
+            kind = 'f'
+        elif prec in self._int_precisions:
+            kind = 'i'
+        else:
+            raise ValueError('Not an appropriate precision')
+        endian = self.ENDIAN.replace('@', '=')
+        header = endian+'i%d' % struct.calcsize(self.ENDIAN+self.HEADER_PREC)
+        data = endian+kind+'%d' % struct.calcsize(self.ENDIAN+prec)
+        return numpy.dtype([('head', header),
+                            ('data', data, (ncols,)),
+                            ('tail', header)])
+
+    def readRecordArray(self, n, ncols, prec='d'):
+        """Read n records of ncols numbers each into an (n, ncols) array.
+
+        All the records are read at once, and the record markers are
+        checked for all the records.
+
+        Parameters
+        ----------
+        n : integer
+            Number of records to read
+        ncols : integer
+            Number of numbers in each record
+        prec : character, optional
+            Specify the precision of the data using character codes
+            from Python's struct module.  Possible values are 'd', 'f',
+            'h', 'i', 'l' and 'q'.
+
+        """
+        dt = self._record_dtype(ncols, prec)
+        rec = numpy.fromfile(self, dtype=dt, count=n)
+        if len(rec) != n:
+            raise IOError('Could not read enough data.'
+                          '  Wanted %d records, got %d.' % (n, len(rec)))
+        length_bytes = dt['data'].itemsize
+        if numpy.any(rec['head'] != length_bytes) or \
+           numpy.any(rec['tail'] != length_bytes):
+            raise IOError('Error reading record from data file')
+        return numpy.array(rec['data'])
+
+    def skipRecordArray(self, n, ncols, prec='d'):
+        """Skip n records of ncols numbers each without reading them.
+
+        Parameters
+        ----------
+        n : integer
+            Number of records to skip
+        ncols : integer
+            Number of numbers in each record
+        prec : character, optional
+            Precision of the data, see readRecordArray.
+
+        """
+        self.seek(n*self._record_dtype(ncols, prec).itemsize, 1)
+
+    def writeRecordArray(self, arr, prec='d'):
+        """Write each row of a 2D array as a record.
+
+        All the records with their markers are formed in memory and
+        written at once.
+
+        Parameters
+        ----------
+        arr : array
+            (n, ncols) data to write, n records of ncols numbers
+        prec : string
+            Character code for the precision to use in writing.
+            Possible values are 'd', 'f', 'h', 'i', 'l' and 'q'.
+        """
+        arr = numpy.asarray(arr)
+        if arr.ndim != 2:
+            raise ValueError('Not a 2D array')
+        dt = self._record_dtype(arr.shape[1], prec)
+        rec = numpy.empty(arr.shape[0], dtype=dt)
+        rec['head'] = dt['data'].itemsize
+        rec['data'] = arr
+        rec['tail'] = dt['data'].itemsize
+        self.write(rec.tostring())
+
     _int_precisions = 'hilq'
 
     def readInts(self, prec='i'):
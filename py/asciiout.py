@@ -0,0 +1,70 @@
+# fast formatted ASCII output of arrays
+# used for ubgaiae-in.asc in galaxia2ubgaiae.py
+
+"""Formatted ASCII output of a 2D array, block by block.
+
+A block of rows is formatted with one string formatting operation,
+instead of one for each row.  The blocks can be formatted by a pool of
+worker processes, and they are written in the original order.  The file
+is gzip compressed if the file name ends with '.gz'.
+
+Examples
+--------
+
+    >>> f = open_ascii('ubgaiae-in.asc.gz')
+    >>> write_ascii(f, np.column_stack([alps, dels, diss]))
+    >>> f.close()
+"""
+
+import gzip
+import numpy as np
+
+# number of rows formatted at once
+nblock = 20000
+
+
+def open_ascii(fname, mode='w'):
+    """Open an ASCII file, gzip compressed if fname ends with '.gz'."""
+    if fname.endswith('.gz'):
+        return gzip.open(fname, mode+'b')
+    return open(fname, mode)
+
+
+def format_block(args):
+    """Format the rows of a block as ' fmt fmt ... fmt\\n'.
+
+    Parameters
+    ----------
+    args : tuple
+        (block, fmt), block is (n, k) array and fmt is the format of
+        each column, like '%12.5e'
+    """
+    block, fmt = args
+    if len(block) == 0:
+        return ''
+    rowfmt = ' '.join(['']+[fmt]*block.shape[1])+'\n'
+    return (rowfmt*len(block)) % tuple(block.ravel().tolist())
+
+
+def write_ascii(f, data, fmt='%12.5e', pool=None):
+    """Write the rows of data to the opened file f.
+
+    Parameters
+    ----------
+    f : file
+        output file, see open_ascii
+    data : array
+        (n, k) data to write
+    fmt : string, optional
+        format of each column
+    pool : multiprocessing.Pool, optional
+        if given, the blocks are formatted by the worker processes
+    """
+    data = np.asarray(data)
+    blocks = [(data[i:i+nblock], fmt) for i in range(0, len(data), nblock)]
+    if pool is None:
+        lines = (format_block(b) for b in blocks)
+    else:
+        lines = pool.imap(format_block, blocks)
+    for s in lines:
+        f.write(s)
@@ -0,0 +1,221 @@
+# benchmark of the stages of the pipeline with synthetic galaxia output
+# used by runbenchmark.py
+
+"""Throughput and memory of each stage of the pipeline.
+
+The stages are run one by one on synthetic galaxia outputs
+(synthgalaxia.py) of several sizes, each in a new process, so that the
+peak resident memory (ru_maxrss) of the process is the one of the stage.
+The stages read the files written by the previous stages in a work
+directory:
+
+    ingest     galaxia output -> magnitude cut -> ubgaiaein.bin
+    transform  Galactic -> equatorial (galaxia_ingest.galeq) of all stars
+    fortranio  ubgaiaein.bin bulk read and write (FortranFile)
+    errors     ubgaiaein.bin -> gaiaed-out.bin (ubgaiae_parallel)
+    fits       gaiaed-out.bin -> FITS file (fitsout.FitsTableWriter)
+
+Examples
+--------
+
+    >>> results = run_benchmark('bench', [10**4, 10**5, 10**6])
+    >>> print_results(results)
+"""
+
+import os
+import time
+import resource
+import multiprocessing
+import numpy as np
+from FortranFile import FortranFile
+import galaxia_ingest
+import synthgalaxia
+import ubgaiae_parallel
+import gaiaeout
+import fitsout
+
+stages = ['ingest', 'transform', 'fortranio', 'errors', 'fits']
+
+# parameters of the pipeline
+vmaglim = 13.0
+month = 22.0
+CAfactor = 1.0
+jflag = 1
+seed = 1111
+nchunk = 1000000
+
+
+def _maxrss():
+    """Peak resident memory of the process in bytes."""
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+
+def _files(workdir, ns):
+    """File names of the stages for ns stars."""
+    root = os.path.join(workdir, 'n%d' % ns)
+    return {'ebf': root+'-galaxy.ebf',
+            'ubgaiaein': root+'-ubgaiaein.bin',
+            'copy': root+'-ubgaiaein-copy.bin',
+            'gaiaei': root+'-gaiaei-out.bin',
+            'gaiaed': root+'-gaiaed-out.bin',
+            'fits': root+'-galaxia_gaiadr2.fits'}
+
+
+def stage_ingest(files):
+    """Magnitude cut of the galaxia output, written to ubgaiaein.bin.
+
+    Returns the number of stars read.
+    """
+    nsall = galaxia_ingest.nrows(files['ebf'])
+    f = FortranFile(files['ubgaiaein'], mode='w')
+    f.writeInts(np.reshape(0, 1))
+    ns = 0
+    for begin, end in galaxia_ingest.chunks(nsall, nchunk):
+        sel = galaxia_ingest.read_selected(files['ebf'], begin, end, vmaglim)
+        f.writeRecordArray(galaxia_ingest.ubgaiaein_records(sel), prec='d')
+        ns += len(sel['alps'])
+    f.seek(0)
+    f.writeInts(np.reshape(ns, 1))
+    f.close()
+    return nsall
+
+
+def stage_transform(files):
+    """Galactic -> equatorial transformation of all the stars.
+
+    The datasets are read before the timer starts, see run_stage.
+    Returns the number of stars.
+    """
+    ns = galaxia_ingest.nrows(files['ebf'])
+    data = galaxia_ingest.read_chunk(files['ebf'], 0, ns,
+                                     ['px', 'py', 'pz', 'vx', 'vy', 'vz'])
+    t0 = time.time()
+    c0 = time.clock()
+    galaxia_ingest.galeq(data['px'], data['py'], data['pz'],
+                         data['vx'], data['vy'], data['vz'])
+    return ns, time.time()-t0, time.clock()-c0
+
+
+def stage_fortranio(files):
+    """Read ubgaiaein.bin at once and write it again.
+
+    Returns the number of stars.
+    """
+    f = FortranFile(files['ubgaiaein'])
+    ns = f.readInts()[0]
+    stars = f.readRecordArray(ns, ubgaiae_parallel.ncolin, 'd')
+    f.close()
+    f = FortranFile(files['copy'], mode='w')
+    f.writeInts(np.reshape(ns, 1))
+    f.writeRecordArray(stars, prec='d')
+    f.close()
+    return ns
+
+
+def stage_errors(files):
+    """Gaia errors of ubgaiaein.bin.  Returns the number of stars."""
+    return ubgaiae_parallel.run_errors(
+        files['ubgaiaein'], files['gaiaei'], files['gaiaed'], month,
+        CAfactor, jflag, seed=seed)
+
+
+def stage_fits(files):
+    """FITS file of gaiaed-out.bin.  Returns the number of stars."""
+    ns = gaiaeout.read_nstars(files['gaiaei'])
+    f = FortranFile(files['gaiaed'])
+    fout = fitsout.FitsTableWriter(files['fits'], True)
+    for begin in range(0, ns, nchunk):
+        rdata = gaiaeout.read_gaiaed(f, min(nchunk, ns-begin))
+        fout.write(fitsout.to_degree(rdata))
+    fout.close()
+    f.close()
+    return ns
+
+
+def _run_stage(stage, files, conn):
+    """Run the stage and send the result to the parent process."""
+    rss0 = _maxrss()
+    t0 = time.time()
+    c0 = time.clock()
+    ret = globals()['stage_'+stage](files)
+    wall = time.time()-t0
+    cpu = time.clock()-c0
+    if isinstance(ret, tuple):
+        # the stage has its own timer
+        ret, wall, cpu = ret
+    conn.send({'stage': stage, 'nstars': int(ret), 'wall': wall,
+               'cpu': cpu, 'maxrss': _maxrss(), 'rss_start': rss0})
+    conn.close()
+
+
+def run_stage(stage, files):
+    """Run the stage in a new process.
+
+    Returns
+    -------
+    dict of stage, nstars (number of stars processed), wall and cpu
+    (time in sec), stars_per_sec, maxrss (peak resident memory in bytes)
+    and rss_start (the one at the start of the stage)
+    """
+    parent, child = multiprocessing.Pipe(duplex=False)
+    p = multiprocessing.Process(target=_run_stage,
+                                args=(stage, files, child))
+    p.start()
+    res = parent.recv()
+    p.join()
+    if res['wall'] > 0.0:
+        res['stars_per_sec'] = res['nstars']/res['wall']
+    else:
+        res['stars_per_sec'] = float('inf')
+    return res
+
+
+def run_benchmark(workdir, sizes, stages=stages, keep=False, gen_seed=5):
+    """Run the stages for the synthetic galaxia outputs of the sizes.
+
+    Parameters
+    ----------
+    workdir : string
+        directory of the synthetic galaxia outputs and the other files.
+        The galaxia outputs are kept and used again.
+    sizes : list
+        numbers of stars of the galaxia outputs
+    stages : list, optional
+        stages to run.  A stage needs the files of the previous stages.
+    keep : bool, optional
+        keep the files written by the stages
+    gen_seed : integer, optional
+        random seed of the synthetic galaxia outputs
+
+    Returns
+    -------
+    list of the dicts of run_stage, with size (number of stars in the
+    galaxia output)
+    """
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    results = []
+    for ns in sizes:
+        files = _files(workdir, ns)
+        if not os.path.exists(files['ebf']):
+            synthgalaxia.write_synthetic(files['ebf'], ns, seed=gen_seed)
+        for stage in stages:
+            res = run_stage(stage, files)
+            res['size'] = ns
+            results.append(res)
+        if not keep:
+            for key in files:
+                if key != 'ebf' and os.path.exists(files[key]):
+                    os.remove(files[key])
+    return results
+
+
+def print_results(results):
+    """Print the results of run_benchmark as a table."""
+    print '%10s %-10s %10s %9s %9s %12s %9s' % (
+        'size', 'stage', 'nstars', 'wall(s)', 'cpu(s)', 'stars/s', 'RSS(MB)')
+    for r in results:
+        print '%10d %-10s %10d %9.3f %9.3f %12.4g %9.1f' % (
+            r['size'], r['stage'], r['nstars'], r['wall'], r['cpu'],
+            r['stars_per_sec'], r['maxrss']/1048576.0)
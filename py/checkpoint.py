@@ -0,0 +1,249 @@
+# manifests of the stages of the pipeline, to skip or resume a stage
+# used by galaxia2ubgaiae.py, ubgaiaein2out.py and ubgaiae2fits.py
+
+"""Stage manifests with a key of the inputs and parameters.
+
+Each stage (galaxia2ubgaiae.py, ubgaiaein2out.py, ubgaiae2fits.py)
+writes <stage>.manifest.json with a key, the SHA-1 of the stage name,
+its parameters, its output file names, the digests of its input files
+and the hash of its code (the source files of the script and the modules
+it uses, see code_hash), and the sizes and modification times of its
+outputs.  A stage run with another version of the code is neither
+skipped nor continued.
+
+* If the manifest is complete, has the same key, and the outputs have
+  the recorded sizes and modification times, the stage is up to date
+  and can be skipped (Manifest.is_done).
+* The stage records a checkpoint after each chunk (Manifest.checkpoint):
+  the number of chunks done, the sizes of the outputs and the state of
+  the stage (e.g. the number of stars written).  If the stage is run
+  again with the same key, the outputs are truncated to the sizes of the
+  last checkpoint and the stage continues from the next chunk
+  (Manifest.resume).
+
+The digest of an input file written by another complete stage of the
+same directory is the key of that stage, so that the large files
+between the stages are not read again.  The other input files (e.g. the
+galaxia output) are hashed (SHA-1 of their contents) once, and the hash
+is used again while their size and modification time are the same.
+
+Examples
+--------
+
+    >>> man = Manifest('ubgaiaein2out', ['ubgaiaein.bin'],
+    ...                ['gaiaei-out.bin', 'gaiaed-out.bin'],
+    ...                {'month': 22.0, 'seed': 1111},
+    ...                modules=[__file__, ubgaiae_parallel, gaia_errors])
+    >>> if not man.is_done():
+    ...     ichunk, state = man.resume()
+    ...     for i in range(ichunk, nchunks):
+    ...         ...
+    ...         man.checkpoint(i+1, {'ns': ns}, [f])
+    ...     man.finish()
+"""
+
+import os
+import glob
+import json
+import hashlib
+
+# suffix of the manifest files
+suffix = '.manifest.json'
+
+
+def file_hash(fname, nblock=16777216):
+    """SHA-1 of the contents of the file, read nblock bytes at once."""
+    h = hashlib.sha1()
+    f = open(fname, 'rb')
+    while True:
+        buf = f.read(nblock)
+        if not buf:
+            break
+        h.update(buf)
+    f.close()
+    return h.hexdigest()
+
+
+def code_hash(modules):
+    """SHA-1 of the source files of the code of a stage.
+
+    Parameters
+    ----------
+    modules : list
+        modules, or names of the files the outputs depend on (e.g. the
+        script itself or the tables of gaia_errors)
+    """
+    h = hashlib.sha1()
+    for m in modules:
+        fname = m if isinstance(m, str) else m.__file__
+        # the source, not the compiled module
+        if fname.endswith('.pyc'):
+            fname = fname[:-1]
+        h.update(file_hash(fname))
+    return h.hexdigest()
+
+
+def read_manifest(fname):
+    """Manifest in the file, or None if there is no file."""
+    if not os.path.exists(fname):
+        return None
+    f = open(fname)
+    man = json.load(f)
+    f.close()
+    return man
+
+
+def write_manifest(fname, man):
+    """Write the manifest, replacing the file at once."""
+    tmp = fname+'.tmp'
+    f = open(tmp, 'w')
+    json.dump(man, f, indent=1, sort_keys=True)
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.rename(tmp, fname)
+
+
+def _stat(fname):
+    st = os.stat(fname)
+    return {'size': st.st_size, 'mtime': st.st_mtime}
+
+
+def _same_stat(fname, rec):
+    return os.path.exists(fname) and \
+        _stat(fname) == {'size': rec['size'], 'mtime': rec['mtime']}
+
+
+def file_digest(fname, mdir='.', known=None):
+    """Digest of an input file.
+
+    Parameters
+    ----------
+    fname : string
+        absolute file name
+    mdir : string, optional
+        directory of the manifests of the other stages
+    known : dict, optional
+        records of the inputs of the previous manifest, whose digests are
+        used again if the size and modification time are the same
+
+    Returns
+    -------
+    'stage:<key>' if fname is an output of a complete stage in mdir,
+    'sha1:<SHA-1 of the contents>' otherwise
+    """
+    for mfile in sorted(glob.glob(os.path.join(mdir, '*'+suffix))):
+        man = read_manifest(mfile)
+        if man['complete'] and fname in man['outputs'] and \
+           _same_stat(fname, man['outputs'][fname]):
+            return 'stage:'+man['key']
+    if known and fname in known and _same_stat(fname, known[fname]):
+        return known[fname]['digest']
+    return 'sha1:'+file_hash(fname)
+
+
+class Manifest(object):
+
+    """Manifest of a stage."""
+
+    def __init__(self, name, inputs, outputs, params, mdir='.', modules=()):
+        """
+        Parameters
+        ----------
+        name : string
+            name of the stage, the manifest is mdir/<name>.manifest.json
+        inputs, outputs : list
+            input and output file names
+        params : dict
+            parameters of the stage, in JSON types
+        mdir : string, optional
+            directory of the manifests
+        modules : list, optional
+            code of the stage, see code_hash
+        """
+        self.fname = os.path.join(mdir, name+suffix)
+        self.inputs = [os.path.abspath(f) for f in inputs]
+        self.outputs = [os.path.abspath(f) for f in outputs]
+        old = read_manifest(self.fname)
+        known = old['inputs'] if old is not None else None
+        digests = {}
+        for f in self.inputs:
+            digests[f] = dict(_stat(f), digest=file_digest(f, mdir, known))
+        code = code_hash(modules)
+        self.man = {'stage': name, 'params': params, 'inputs': digests,
+                    'code': code, 'outputs': {}, 'complete': False,
+                    'chunk': 0, 'state': {}}
+        key = {'stage': name, 'params': params, 'outputs': self.outputs,
+               'inputs': dict((f, d['digest']) for f, d in digests.items()),
+               'code': code}
+        self.key = hashlib.sha1(json.dumps(key, sort_keys=True)).hexdigest()
+        self.man['key'] = self.key
+        # previous manifest of the same key
+        if old is not None and old['key'] == self.key:
+            self.old = old
+        else:
+            self.old = None
+
+    def is_done(self):
+        """True if the outputs of the same key are complete."""
+        if self.old is None or not self.old['complete']:
+            return False
+        return all(f in self.old['outputs'] and
+                   _same_stat(f, self.old['outputs'][f])
+                   for f in self.outputs)
+
+    def resume(self):
+        """Start the stage from the last checkpoint.
+
+        The outputs are truncated to their sizes at the checkpoint.  If
+        there is no checkpoint of the same key, or an output is shorter
+        than at the checkpoint, the stage starts from the beginning.
+
+        Returns
+        -------
+        number of chunks done, state of the stage at the checkpoint
+        """
+        old = self.old
+        # the outputs written at the end (e.g. a plot) are not in the
+        # checkpoint
+        if old is not None and not old['complete'] and old['chunk'] > 0 \
+           and all(os.path.exists(f) and os.path.getsize(f) >= rec['size']
+                   for f, rec in old['outputs'].items()):
+            for f, rec in old['outputs'].items():
+                fo = open(f, 'r+b')
+                fo.truncate(rec['size'])
+                fo.close()
+            self.man['chunk'] = old['chunk']
+            self.man['state'] = old['state']
+            self.man['outputs'] = old['outputs']
+        write_manifest(self.fname, self.man)
+        return self.man['chunk'], self.man['state']
+
+    def checkpoint(self, chunk, state, files=()):
+        """Record that the chunks before chunk are done.
+
+        Parameters
+        ----------
+        chunk : integer
+            number of chunks done
+        state : dict
+            state of the stage to continue, in JSON types
+        files : list, optional
+            opened output files, flushed before the sizes are recorded
+        """
+        for fo in files:
+            fo.flush()
+            os.fsync(fo.fileno())
+        self.man['chunk'] = chunk
+        self.man['state'] = state
+        self.man['outputs'] = dict((f, _stat(f)) for f in self.outputs
+                                   if os.path.exists(f))
+        write_manifest(self.fname, self.man)
+
+    def finish(self, state=None):
+        """Record that the stage is complete.  The outputs are closed."""
+        if state is not None:
+            self.man['state'] = state
+        self.man['outputs'] = dict((f, _stat(f)) for f in self.outputs)
+        self.man['complete'] = True
+        write_manifest(self.fname, self.man)
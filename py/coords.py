@@ -0,0 +1,139 @@
+# equatorial <-> Galactic coordinates
+# used by galaxia_ingest.py, fitsout.py and tiles.py
+
+"""Equatorial to Galactic transformation of positions and proper motions.
+
+The transformation matrix is the one used by galaxia2ubgaiae.py for the
+Galaxia stars.  galactic computes the sin/cos of (RA, Dec) only once,
+and gives (l, b) and the Galactic proper motions of several pairs of
+(pmRA, pmDec) in one pass, block by block with preallocated buffers.
+It replaces galpy's bovy_coords.radec_to_lb and pmrapmdec_to_pmllpmbb
+(which uses the same rotation of the proper motions).
+
+Examples
+--------
+
+    >>> l, b, pms = galactic(ra, dec, [(pmra, pmdec), (pmra_o, pmdec_o)])
+    >>> pmll, pmbb = pms[0]
+"""
+
+import numpy as np
+
+# 3 axes in Galactic coordinate
+# North Celestial Pole (z-axis)
+lzeq = np.radians(122.93193212)
+bzeq = np.radians(27.12835496)
+# RA,DEC=0,0 (x-axis)
+lxeq = np.radians(96.33723825)
+bxeq = np.radians(-60.18853909)
+#  RA,DEC=90,0 (y-axis)
+lyeq = np.radians(206.98916373)
+byeq = np.radians(-11.42442440)
+# transformation matrix (though it is array in python)
+# equatorial = tmateqga . Galactic
+tmateqga = np.array([
+    [np.cos(lxeq)*np.cos(bxeq), np.sin(lxeq)*np.cos(bxeq), np.sin(bxeq)],
+    [np.cos(lyeq)*np.cos(byeq), np.sin(lyeq)*np.cos(byeq), np.sin(byeq)],
+    [np.cos(lzeq)*np.cos(bzeq), np.sin(lzeq)*np.cos(bzeq), np.sin(bzeq)]
+])
+# North Galactic Pole in equatorial cartesian coordinate
+ngpeq = tmateqga[:, 2]
+
+# number of stars transformed at once
+nblock = 100000
+
+
+def galactic(ra, dec, pms=(), nblock=nblock):
+    """Galactic coordinates and proper motions.
+
+    Parameters
+    ----------
+    ra, dec : array
+        R.A. and Dec. (degree)
+    pms : list, optional
+        pairs of (pmRA*cos(Dec), pmDec) arrays at (ra, dec)
+    nblock : integer, optional
+        number of stars transformed at once
+
+    Returns
+    -------
+    l, b : array
+        Galactic longitude [0, 360) and latitude (degree)
+    pmlbs : list
+        (pml*cos(b), pmb) of each pair of pms
+    """
+    ra = np.asarray(ra, dtype=np.float64)
+    dec = np.asarray(dec, dtype=np.float64)
+    n = len(ra)
+    l = np.empty(n)
+    b = np.empty(n)
+    pmlbs = [(np.empty(n), np.empty(n)) for pm in pms]
+    # buffers
+    m = min(n, nblock)
+    ca, sa, cd, sd, x, y, z, t = [np.empty(m) for i in range(8)]
+    for i in range(0, n, nblock):
+        j = min(i+nblock, n)
+        k = j-i
+        ca, sa, cd, sd, x, y, z, t = [v[:k] for v in
+                                      (ca, sa, cd, sd, x, y, z, t)]
+        np.radians(ra[i:j], out=t)
+        np.cos(t, out=ca)
+        np.sin(t, out=sa)
+        np.radians(dec[i:j], out=t)
+        np.cos(t, out=cd)
+        np.sin(t, out=sd)
+        # equatorial cartesian: (cd*ca, cd*sa, sd)
+        # Galactic cartesian = tmateqga^T . equatorial
+        for v, col in ((x, 0), (y, 1), (z, 2)):
+            np.multiply(ca, tmateqga[0, col], out=v)
+            v *= cd
+            np.multiply(sa, tmateqga[1, col], out=t)
+            t *= cd
+            v += t
+            np.multiply(sd, tmateqga[2, col], out=t)
+            v += t
+        np.arctan2(y, x, out=t)
+        np.degrees(t, out=l[i:j])
+        l[i:j][l[i:j] < 0.0] += 360.0
+        # arctan2 rather than arcsin, which is not accurate near the
+        # poles, where the matrix is not exactly orthonormal
+        np.hypot(x, y, out=t)
+        np.arctan2(z, t, out=t)
+        np.degrees(t, out=b[i:j])
+
+        if len(pms) == 0:
+            continue
+        # rotation angle of the proper motions, as Poleski (2013)
+        # cosphi = ngp . e_dec, sinphi = -ngp . e_ra
+        # x, y are reused for cosphi, sinphi
+        np.multiply(ca, ngpeq[0], out=x)
+        np.multiply(sa, ngpeq[1], out=t)
+        x += t
+        x *= sd
+        np.multiply(cd, ngpeq[2], out=t)
+        np.subtract(t, x, out=x)
+        np.multiply(sa, ngpeq[0], out=y)
+        np.multiply(ca, ngpeq[1], out=t)
+        y -= t
+        # normalization
+        np.hypot(x, y, out=t)
+        x /= t
+        y /= t
+        for (pmra, pmdec), (pml, pmb) in zip(pms, pmlbs):
+            pmra = np.asarray(pmra)[i:j]
+            pmdec = np.asarray(pmdec)[i:j]
+            # pml = cosphi*pmra+sinphi*pmdec
+            np.multiply(x, pmra, out=pml[i:j])
+            np.multiply(y, pmdec, out=t)
+            pml[i:j] += t
+            # pmb = -sinphi*pmra+cosphi*pmdec
+            np.multiply(x, pmdec, out=pmb[i:j])
+            np.multiply(y, pmra, out=t)
+            pmb[i:j] -= t
+    return l, b, pmlbs
+
+
+def radec_to_lb(ra, dec):
+    """Galactic longitude and latitude (degree) of (ra, dec) in degree."""
+    l, b, pmlbs = galactic(ra, dec)
+    return l, b
@@ -0,0 +1,306 @@
+# heliocentric phase-space coordinates and their errors of gaiaed-out.bin
+# used by errstats.py and the analysis scripts
+
+"""Derived phase-space columns of gaiaed-out.bin with a sidecar cache.
+
+The columns of ``columns`` are the distance, heliocentric position and
+velocity (in the equatorial frame, x towards alpha=0, z towards the
+north celestial pole) and the tangential velocities, computed from the
+true (or observed) astrometry, and their errors.  The errors are
+propagated with the Jacobian of (x, y, z, vx, vy, vz) with respect to
+(alpha*, delta, parallax, mu_alpha*, mu_delta, Vr), with uncorrelated
+astrometric errors.  e_alpha of gaiaed-out.bin is alpha/cos(delta) (as
+in the Fortran code), so the error of alpha* is e_delta times the ratio
+of the geometrical factors of alpha* and delta, the mean factors for
+jflag=1 and the ones at the true position of each star for jflag=-1
+(see gaia_errors.geometrical_factors).
+
+The columns are computed chunk by chunk and written to a sidecar
+directory (gaiaed-out-derived/ for gaiaed-out.bin) with one .npy file
+for each column and derived.json with the SHA-1 of gaiaed-out.bin and
+jflag.  load_columns maps only the columns asked for, and computes the
+sidecar again if gaiaed-out.bin or jflag has changed.  The hash is
+computed only if the size or the modification time of gaiaed-out.bin
+has changed.
+
+Examples
+--------
+
+    >>> cols = load_columns('gaiaed-out.bin', ['dist', 'e_dist'])
+    >>> jac = jacobian(alpha, delta, plx, pmra, pmdec, vrad)
+    >>> cov = covariance(jac, sigma)
+"""
+
+import os
+import json
+import numpy as np
+from gaiaeout import memmap_gaiaed
+from checkpoint import file_hash
+from gaia_errors import geometrical_factors
+
+# constant for proper motion unit conversion
+# mas, mas/yr -> km/s
+pmvconst = 4.74047
+
+# mas -> radian
+mas = np.pi/(180.0*3600.0*1000.0)
+
+# phase-space coordinates, in the order of the Jacobian
+phase_columns = ['px', 'py', 'pz', 'vx', 'vy', 'vz']
+# derived columns and units
+columns = ['dist', 'valpha', 'vdelta']+phase_columns \
+    +['e_dist', 'e_valpha', 'e_vdelta']+['e_'+c for c in phase_columns]
+units = {'dist': 'kpc', 'valpha': 'km/s', 'vdelta': 'km/s',
+         'px': 'kpc', 'py': 'kpc', 'pz': 'kpc',
+         'vx': 'km/s', 'vy': 'km/s', 'vz': 'km/s'}
+for c in list(units):
+    units['e_'+c] = units[c]
+
+# number of stars computed at once
+nchunk = 100000
+
+# name of the description file in the sidecar directory
+descfile = 'derived.json'
+
+
+def jacobian(alpha, delta, plx, pmra, pmdec, vrad, out=None):
+    """Jacobian of the heliocentric phase-space coordinates.
+
+    Parameters
+    ----------
+    alpha, delta : array
+        (N,) position (radian)
+    plx : array
+        (N,) parallax (mas)
+    pmra, pmdec : array
+        (N,) proper motion mu_alpha*, mu_delta (mas/yr)
+    vrad : array
+        (N,) radial velocity (km/s)
+    out : array, optional
+        (N, 6, 6) array for the result
+
+    Returns
+    -------
+    (N, 6, 6) array of d(x, y, z, vx, vy, vz)/d(alpha*, delta, parallax,
+    mu_alpha*, mu_delta, Vr), in kpc and km/s per mas, mas/yr and km/s
+    """
+    n = len(plx)
+    if out is None:
+        out = np.empty((n, 6, 6))
+    ca, sa = np.cos(alpha), np.sin(alpha)
+    cd, sd = np.cos(delta), np.sin(delta)
+    td = sd/cd
+    dist = 1.0/plx
+    # unit vectors of the line of sight, east and north
+    r = np.array([cd*ca, cd*sa, sd])
+    p = np.array([-sa, ca, np.zeros(n)])
+    q = np.array([-sd*ca, -sd*sa, cd])
+    valpha = pmvconst*pmra*dist
+    vdelta = pmvconst*pmdec*dist
+    # position = dist*r
+    out[:, 0:3, 0] = (dist*p*mas).T
+    out[:, 0:3, 1] = (dist*q*mas).T
+    out[:, 0:3, 2] = (-dist*dist*r).T
+    out[:, 0:3, 3:6] = 0.0
+    # velocity = vrad*r+valpha*p+vdelta*q
+    out[:, 3:6, 0] = ((vrad*p-valpha*(r-td*q)-vdelta*td*p)*mas).T
+    out[:, 3:6, 1] = ((vrad*q-vdelta*r)*mas).T
+    out[:, 3:6, 2] = (-(valpha*p+vdelta*q)*dist).T
+    out[:, 3:6, 3] = (pmvconst*dist*p).T
+    out[:, 3:6, 4] = (pmvconst*dist*q).T
+    out[:, 3:6, 5] = r.T
+    return out
+
+
+def propagate(jac, sigma):
+    """Errors of the phase-space coordinates.
+
+    Parameters
+    ----------
+    jac : array
+        (N, 6, 6) Jacobian
+    sigma : array
+        (N, 6) uncorrelated errors of (alpha*, delta, parallax, mu_alpha*,
+        mu_delta, Vr) in mas, mas, mas, mas/yr, mas/yr, km/s
+
+    Returns
+    -------
+    (N, 6) array
+    """
+    return np.sqrt(np.einsum('nij,nj->ni', jac**2, sigma**2))
+
+
+def covariance(jac, sigma):
+    """(N, 6, 6) covariance of the phase-space coordinates."""
+    return np.einsum('nij,nj,nkj->nik', jac, sigma**2, jac)
+
+
+def astrometry(rdata, source='true', jflag=1):
+    """Astrometry and its errors of the gaiaed-out.bin records.
+
+    Parameters
+    ----------
+    rdata : structured array
+        gaiaed-out.bin records (see gaiaeout.py)
+    source : string, optional
+        'true' or 'obs' values of the astrometry
+    jflag : int, optional
+        jflag of the errors (see gaia_errors.gaia_errors), for the error
+        of alpha*
+
+    Returns
+    -------
+    alpha, delta, plx, pmra, pmdec, vrad and (N, 6) sigma
+    """
+    names = ['alpha', 'delta', 'plx', 'pmra', 'pmdec', 'vrad']
+    a = [np.asarray(rdata[c+'_'+source], dtype=np.float64) for c in names]
+    sigma = np.empty((len(rdata), 6))
+    # e_alpha is alpha/cos(delta), see the module docstring
+    g = geometrical_factors(jflag, np.asarray(rdata['alpha_true']),
+                            np.asarray(rdata['delta_true']))
+    sigma[:, 0] = rdata['e_delta']*(g[..., 0]/g[..., 1])
+    for i, c in enumerate(names[1:]):
+        sigma[:, i+1] = rdata['e_'+c]
+    return a+[sigma]
+
+
+def derived_columns(rdata, source='true', jflag=1):
+    """Derived columns of the gaiaed-out.bin records.
+
+    Parameters
+    ----------
+    rdata : structured array
+        gaiaed-out.bin records (see gaiaeout.py)
+    source, jflag : optional
+        see astrometry
+
+    Returns
+    -------
+    dict of the arrays of ``columns``
+    """
+    alpha, delta, plx, pmra, pmdec, vrad, sigma = astrometry(rdata, source,
+                                                             jflag)
+    jac = jacobian(alpha, delta, plx, pmra, pmdec, vrad)
+    cols = {}
+    cols['dist'] = 1.0/plx
+    cols['valpha'] = pmvconst*pmra*cols['dist']
+    cols['vdelta'] = pmvconst*pmdec*cols['dist']
+    # jac[:, 3:6, 5] is the line of sight, so that position = dist*r
+    # and velocity = jac[:, 3:6, 3:6].(mu_alpha*, mu_delta, Vr)
+    for i, c in enumerate(phase_columns[:3]):
+        cols[c] = cols['dist']*jac[:, 3+i, 5]
+    for i, c in enumerate(phase_columns[3:]):
+        cols[c] = pmra*jac[:, 3+i, 3]+pmdec*jac[:, 3+i, 4] \
+            + vrad*jac[:, 3+i, 5]
+    err = propagate(jac, sigma)
+    for i, c in enumerate(phase_columns):
+        cols['e_'+c] = err[:, i]
+    cols['e_dist'] = sigma[:, 2]*cols['dist']**2
+    cols['e_valpha'] = pmvconst*cols['dist']*np.hypot(
+        sigma[:, 3], pmra*cols['dist']*sigma[:, 2])
+    cols['e_vdelta'] = pmvconst*cols['dist']*np.hypot(
+        sigma[:, 4], pmdec*cols['dist']*sigma[:, 2])
+    return cols
+
+
+def sidecar_dir(fname):
+    """Sidecar directory of gaiaed-out.bin."""
+    return os.path.splitext(fname)[0]+'-derived'
+
+
+def _read_desc(sdir):
+    fdesc = os.path.join(sdir, descfile)
+    if not os.path.exists(fdesc):
+        return None
+    f = open(fdesc)
+    desc = json.load(f)
+    f.close()
+    return desc
+
+
+def _write_desc(sdir, desc):
+    f = open(os.path.join(sdir, descfile), 'w')
+    json.dump(desc, f, indent=1, sort_keys=True)
+    f.close()
+
+
+def is_current(fname, source='true', jflag=1):
+    """True if the sidecar of fname is for the same contents, source and
+    jflag."""
+    desc = _read_desc(sidecar_dir(fname))
+    if desc is None or desc['source'] != source \
+       or desc.get('jflag') != jflag \
+       or sorted(desc['columns']) != sorted(columns):
+        return False
+    st = os.stat(fname)
+    if desc['size'] == st.st_size and desc['mtime'] == st.st_mtime:
+        return True
+    if desc['size'] != st.st_size or desc['sha1'] != file_hash(fname):
+        return False
+    # same contents, e.g. copied: the hash is not computed again
+    desc['mtime'] = st.st_mtime
+    _write_desc(sidecar_dir(fname), desc)
+    return True
+
+
+def write_sidecar(fname, nset=None, source='true', nchunk=nchunk, jflag=1):
+    """Compute the derived columns of gaiaed-out.bin to its sidecar.
+
+    Parameters
+    ----------
+    fname : string
+        gaiaed-out.bin file name
+    nset : integer, optional
+        number of stars.  The default is from the size of the file.
+    source : string, optional
+        'true' or 'obs' values of the astrometry
+    nchunk : integer, optional
+        number of stars computed at once
+    jflag : int, optional
+        jflag of the errors of gaiaed-out.bin, see astrometry
+    """
+    sdir = sidecar_dir(fname)
+    if not os.path.isdir(sdir):
+        os.makedirs(sdir)
+    # the description is written last, so that an incomplete sidecar
+    # is not used
+    fdesc = os.path.join(sdir, descfile)
+    if os.path.exists(fdesc):
+        os.remove(fdesc)
+    st = os.stat(fname)
+    rdata = memmap_gaiaed(fname, nset)
+    ns = len(rdata)
+    out = dict((c, np.lib.format.open_memmap(
+        os.path.join(sdir, c+'.npy'), mode='w+', dtype=np.float64,
+        shape=(ns,))) for c in columns)
+    for begin in range(0, ns, nchunk):
+        cols = derived_columns(rdata[begin:begin+nchunk], source, jflag)
+        for c in columns:
+            out[c][begin:begin+nchunk] = cols[c]
+    for c in columns:
+        out[c].flush()
+    del out
+    desc = {'file': os.path.basename(fname), 'size': st.st_size,
+            'mtime': st.st_mtime, 'sha1': file_hash(fname),
+            'source': source, 'jflag': jflag, 'nstars': ns,
+            'columns': columns, 'units': units}
+    _write_desc(sdir, desc)
+
+
+def load_columns(fname='gaiaed-out.bin', names=columns, nset=None,
+                 source='true', nchunk=nchunk, jflag=1):
+    """Derived columns of gaiaed-out.bin from its sidecar.
+
+    The sidecar is computed first if it does not exist, or gaiaed-out.bin
+    or jflag has changed.  jflag should be the one of the errors of
+    gaiaed-out.bin (see astrometry).
+
+    Returns
+    -------
+    dict of the read-only memory-mapped arrays of the columns names
+    """
+    if not is_current(fname, source, jflag):
+        write_sidecar(fname, nset, source, nchunk, jflag)
+    sdir = sidecar_dir(fname)
+    return dict((c, np.load(os.path.join(sdir, c+'.npy'), mmap_mode='r'))
+                for c in names)
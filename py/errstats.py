@@ -0,0 +1,255 @@
+# binned statistics of the errors vs. distance of gaiaed-out.bin
+# used by plotde_d.py, plotvpe_d.py and plotvre_d.py
+
+"""Error vs. distance statistics in one pass over gaiaed-out.bin.
+
+The distance (1/plx_true) and the errors of the plot scripts (e_dist,
+e_vdelta of derived.py and e_vrad) are read chunk by chunk, and the
+following are accumulated for each quantity of ``quantities``:
+
+    hist2d       2D histogram of (distance, error) in the range of the plot
+    count, mean, std
+                 of the error in nbin distance bins of [0, rmax]
+    percentiles  of the error in the distance bins, from a fine histogram
+                 with logarithmic bins (qbins per decade in [qmin, qmax])
+
+so that the memory does not depend on the number of stars.  The
+percentiles are interpolated in the fine histogram, and their relative
+accuracy is about 1/qbins decades.  The result is a dict of small arrays,
+saved to a npz file with the input file (name, size and modification
+time) and the binning as the key, and error_stats reads the file again
+instead of the catalog if the key is the same.
+
+Examples
+--------
+
+    >>> stats = error_stats('gaiaed-out.bin', 'errstats.npz', nbin=12,
+    ...                     rmax=15.0)
+    >>> stats['disterr_p50']
+"""
+
+import os
+import json
+import numpy as np
+from gaiaeout import read_nstars, memmap_gaiaed
+import derived
+
+# errors: (unit, lower and upper limits of the 2D histogram, log scale)
+quantities = ['disterr', 'vperr', 'vraderr']
+ranges = {'disterr': ('kpc', 0.001, 15.0, True),
+          'vperr': ('km/s', 0.0, 20.0, False),
+          'vraderr': ('km/s', 0.0, 20.0, False)}
+
+# columns of the errors: derived.py or gaiaed-out.bin
+# vperr is the error of the proper motion velocity in declination
+error_columns = {'disterr': 'e_dist', 'vperr': 'e_vdelta',
+                 'vraderr': 'e_vrad'}
+
+# percentiles of the errors in the distance bins
+percentiles = [16, 50, 84]
+
+# fine histogram for the percentiles (bins per decade and range)
+qbins = 100
+qmin = 1.0e-6
+qmax = 1.0e4
+
+# number of stars read at once
+nchunk = 1000000
+
+
+def _edges(name, n):
+    unit, lo, hi, log = ranges[name]
+    if log:
+        return np.logspace(np.log10(lo), np.log10(hi), n+1)
+    return np.linspace(lo, hi, n+1)
+
+
+def _qedges():
+    ndec = int(round(np.log10(qmax/qmin)))
+    return np.logspace(np.log10(qmin), np.log10(qmax), ndec*qbins+1)
+
+
+def new_stats(nbin=12, rmax=15.0, nx=80, ny=80):
+    """Empty statistics for nbin distance bins up to rmax (kpc) and
+    nx x ny bins of the 2D histograms."""
+    stats = {'nbin': nbin, 'rmax': rmax, 'nx': nx, 'ny': ny, 'nstars': 0,
+             'rbins': np.linspace(0.0, rmax, nbin+1),
+             'xedges': np.linspace(0.0, rmax, nx+1),
+             'qedges': _qedges()}
+    nq = len(stats['qedges'])-1
+    for name in quantities:
+        stats[name+'_yedges'] = _edges(name, ny)
+        stats[name+'_hist2d'] = np.zeros((nx, ny), dtype=np.int64)
+        stats[name+'_count'] = np.zeros(nbin, dtype=np.int64)
+        stats[name+'_sum'] = np.zeros(nbin)
+        stats[name+'_sum2'] = np.zeros(nbin)
+        # with the underflow and overflow bins
+        stats[name+'_qhist'] = np.zeros((nbin, nq+2), dtype=np.int64)
+    return stats
+
+
+def add(stats, dist, err):
+    """Add the stars to the statistics.
+
+    Parameters
+    ----------
+    stats : dict
+        statistics of new_stats
+    dist : array
+        distance (kpc)
+    err : dict
+        arrays of the errors of ``quantities``
+    """
+    stats['nstars'] += len(dist)
+    nbin = stats['nbin']
+    nq = len(stats['qedges'])-1
+    # -1 for the stars with no finite distance
+    ibin = np.floor(np.where(np.isfinite(dist), dist, -1.0)
+                    * (nbin/stats['rmax'])).astype(np.int64)
+    for name in quantities:
+        e = np.asarray(err[name], dtype=np.float64)
+        # as the plot scripts, only the stars inside the plot
+        xe, ye = stats['xedges'], stats[name+'_yedges']
+        sel = (dist < xe[-1]) & (e >= ye[0]) & (e < ye[-1])
+        h, xe, ye = np.histogram2d(dist[sel], e[sel], bins=(xe, ye))
+        stats[name+'_hist2d'] += h.astype(np.int64)
+        sel = np.isfinite(e) & (ibin >= 0) & (ibin < nbin)
+        ib, e = ibin[sel], e[sel]
+        stats[name+'_count'] += np.bincount(ib, minlength=nbin)
+        stats[name+'_sum'] += np.bincount(ib, e, minlength=nbin)
+        stats[name+'_sum2'] += np.bincount(ib, e*e, minlength=nbin)
+        iq = np.searchsorted(stats['qedges'], e, side='right')
+        stats[name+'_qhist'] += np.bincount(
+            ib*(nq+2)+iq, minlength=nbin*(nq+2)).reshape(nbin, nq+2)
+    return stats
+
+
+def _percentile(h, edges, p):
+    """Percentile p of the histogram h with underflow and overflow bins,
+    interpolated in log."""
+    c = np.cumsum(h)
+    if c[-1] == 0:
+        return np.nan
+    i = np.searchsorted(c, p/100.0*c[-1])
+    if i == 0:
+        return edges[0]
+    elif i == len(h)-1:
+        return edges[-1]
+    f = (p/100.0*c[-1]-c[i-1])/float(h[i])
+    lo, hi = np.log(edges[i-1]), np.log(edges[i])
+    return np.exp(lo+f*(hi-lo))
+
+
+def finish(stats):
+    """Add the mean, std and percentiles of the errors in the distance
+    bins to the statistics."""
+    stats['rmid'] = 0.5*(stats['rbins'][1:]+stats['rbins'][:-1])
+    stats['percentiles'] = np.array(percentiles)
+    for name in quantities:
+        n = stats[name+'_count'].astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = stats[name+'_sum']/n
+            var = stats[name+'_sum2']/n-mean**2
+        stats[name+'_mean'] = mean
+        stats[name+'_std'] = np.sqrt(np.maximum(var, 0.0))
+        for p in percentiles:
+            stats[name+'_p%d' % p] = np.array(
+                [_percentile(h, stats['qedges'], p)
+                 for h in stats[name+'_qhist']])
+    return stats
+
+
+def accumulate(inputfiledb='gaiaed-out.bin', nset=None, nbin=12, rmax=15.0,
+               nx=80, ny=80, nchunk=nchunk, jflag=1):
+    """Statistics of gaiaed-out.bin, read nchunk stars at once.
+
+    The derived columns are computed first if they are not in the
+    sidecar of gaiaed-out.bin for jflag (see derived.py).
+    """
+    rdata = memmap_gaiaed(inputfiledb, nset)
+    cols = derived.load_columns(inputfiledb, ['dist', 'e_dist', 'e_vdelta'],
+                                nset, jflag=jflag)
+    cols['e_vrad'] = rdata['e_vrad']
+    stats = new_stats(nbin, rmax, nx, ny)
+    for begin in range(0, len(rdata), nchunk):
+        end = begin+nchunk
+        add(stats, np.asarray(cols['dist'][begin:end]),
+            dict((name, cols[error_columns[name]][begin:end])
+                 for name in quantities))
+    return finish(stats)
+
+
+def cache_key(inputfiledb, nbin, rmax, nx, ny):
+    """Key of the cache file: the input file and the binning."""
+    st = os.stat(inputfiledb)
+    return json.dumps({'file': os.path.abspath(inputfiledb),
+                       'size': st.st_size, 'mtime': st.st_mtime,
+                       'nbin': nbin, 'rmax': rmax, 'nx': nx, 'ny': ny,
+                       'percentiles': percentiles, 'qbins': qbins,
+                       'qmin': qmin, 'qmax': qmax}, sort_keys=True)
+
+
+def save(fname, stats, key=''):
+    """Save the statistics to a npz file."""
+    f = open(fname, 'wb')
+    np.savez(f, key=np.array(key), **stats)
+    f.close()
+
+
+def load(fname, key=None):
+    """Statistics saved by save.  None if key is given and different."""
+    data = np.load(fname)
+    if key is not None and str(data['key']) != key:
+        data.close()
+        return None
+    stats = dict((k, data[k]) for k in data.files if k != 'key')
+    data.close()
+    for k in ('nbin', 'nx', 'ny', 'nstars'):
+        stats[k] = int(stats[k])
+    stats['rmax'] = float(stats['rmax'])
+    return stats
+
+
+def error_stats(inputfiledb='gaiaed-out.bin', cachefile='errstats.npz',
+                nbin=12, rmax=15.0, nx=80, ny=80, inputfileint=None,
+                nchunk=nchunk, jflag=1):
+    """Statistics of gaiaed-out.bin, from cachefile if it is up to date.
+
+    Parameters
+    ----------
+    inputfiledb : string
+        gaiaed-out.bin file name
+    cachefile : string
+        npz file of the statistics ('' for no cache)
+    nbin : integer, optional
+        number of distance bins of [0, rmax]
+    rmax : float, optional
+        maximum distance (kpc) of the bins and the 2D histograms
+    nx, ny : integer, optional
+        number of distance and error bins of the 2D histograms
+    inputfileint : string, optional
+        gaiaei-out.bin file name for the number of stars.  The default is
+        from the size of gaiaed-out.bin.
+    nchunk : integer, optional
+        number of stars read at once
+    jflag : int, optional
+        jflag of the errors of gaiaed-out.bin, for the sidecar of the
+        derived columns (the statistics do not depend on it)
+
+    Returns
+    -------
+    dict with nstars, rbins, rmid, xedges and for each quantity q,
+    q_yedges, q_hist2d, q_count, q_mean, q_std and q_p16, q_p50, q_p84
+    """
+    key = cache_key(inputfiledb, nbin, rmax, nx, ny)
+    if cachefile and os.path.exists(cachefile):
+        stats = load(cachefile, key)
+        if stats is not None:
+            return stats
+    nset = None
+    if inputfileint is not None:
+        nset = read_nstars(inputfileint)
+    stats = accumulate(inputfiledb, nset, nbin, rmax, nx, ny, nchunk, jflag)
+    if cachefile:
+        save(cachefile, stats, key)
+    return stats
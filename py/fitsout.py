@@ -0,0 +1,370 @@
+# FITS table of the gaiaed-out.bin records
+# used by ubgaiae2fits.py and pipeline.py
+
+"""Columns and FITS output of the stars with Gaia errors.
+
+The columns of the FITS table are given as lists of (name, unit, src),
+where src is the column of the gaiaed-out.bin record, or the name of a
+Galactic coordinate column computed by galactic_columns.  There are two
+layouts, the normal one (normal_columns) and the Gaia DR2 format with
+only the observed data (gaiadr2_columns).
+
+The whole table can be written at once with write_fits, or block by
+block with FitsTableWriter, which writes the header once, appends the
+rows of each block and sets NAXIS2 when it is closed.  Both write the
+same file.
+
+Examples
+--------
+
+    >>> rdata = to_degree(rdata)
+    >>> write_fits('galaxia_gaiadr2.fits', rdata, flagGaiaDR2=True)
+
+    >>> fout = FitsTableWriter('galaxia_gaiadr2.fits', flagGaiaDR2=True)
+    >>> for rdata in blocks:
+    ...     fout.write(to_degree(rdata))
+    >>> fout.close()
+"""
+
+import numpy as np
+import pyfits
+import coords
+import gaiaeout
+from runreport import stage
+
+# FITS block size in bytes
+fitsblock = 2880
+
+# primary header and empty table header of each layout, made once
+_headers = {}
+
+# columns of gaiaed-out.bin in radian
+radian_columns = [0, 1, 6, 7, 12, 13]
+
+# Galactic coordinate columns kept in double precision with the
+# 'compact' policy (see gaiaeout.py)
+double_galactic = ['GLON_true', 'GLAT_true']
+
+# normal output
+normal_columns = [
+    ('RA_true', '(degree)', 0),
+    ('DEC_true', '(degree)', 1),
+    ('Plx_true', '(mas)', 2),
+    ('pmRA_true', '(mas/yr)', 3),
+    ('pmDEC_true', '(mas/yr)', 4),
+    ('HRV_true', '(km/s)', 5),
+    # observed
+    ('RA_obs', '(degree)', 6),
+    ('DEC_obs', '(degree)', 7),
+    ('Plx_obs', '(mas)', 8),
+    ('pmRA_obs', '(mas/yr)', 9),
+    ('pmDEC_obs', '(mas/yr)', 10),
+    ('HRV_obs', '(km/s)', 11),
+    # error
+    ('e_RA', '(degree)', 12),
+    ('e_DEC', '(degree)', 13),
+    ('e_Plx', '(mas)', 14),
+    ('e_pmRA', '(mas/yr)', 15),
+    ('e_pmDEC', '(mas/yr)', 16),
+    ('e_HRV', '(km/s)', 17),
+    # True
+    ('G_true', '(mag)', 18),
+    ('G_BP_true', '(mag)', 20),
+    ('G_RP_true', '(mag)', 21),
+    # Observed
+    ('G_obs', '(mag)', 22),
+    ('G_BP_obs', '(mag)', 24),
+    ('G_RP_obs', '(mag)', 25),
+    # Error
+    ('e_G', '(mag)', 26),
+    ('e_G_BP', '(mag)', 28),
+    ('e_G_RP', '(mag)', 29),
+    # True
+    ('Teff_true', '(K)', 30),
+    ('logg_true', '(dex)', 31),
+    ('[Fe/H]_true', '(dex)', 32),
+    ('Av_true', '(mag)', 33),
+    # Observed
+    ('Teff_obs', '(K)', 34),
+    ('logg_obs', '(dex)', 35),
+    ('[Fe/H]_obs', '(dex)', 36),
+    ('Av_obs', '(mag)', 37),
+    # Errors
+    ('e_Teff', '(K)', 38),
+    ('e_logg', '(dex)', 39),
+    ('e_[Fe/H]', '(dex)', 40),
+    ('e_Av', '(mag)', 41),
+    # V,VI,GRVS,Age
+    ('V', '(mag)', 42),
+    ('V-I', '(mag)', 43),
+    ('G_RVS', '(mag)', 44),
+    ('Age', '(Gyr)', 45),
+    # GLON and GLAT only true
+    ('GLON_true', '(degree)', 'GLON_true'),
+    ('GLAT_true', '(degree)', 'GLAT_true'),
+    # pmGLON and pmGLAT true
+    ('pmGLON_true', '(mas/yr)', 'pmGLON_true'),
+    ('pmGLAT_true', '(mas/yr)', 'pmGLAT_true'),
+    # observed
+    ('pmGLON_obs', '(mas/yr)', 'pmGLON_obs'),
+    ('pmGLAT_obs', '(mas/yr)', 'pmGLAT_obs'),
+    # Errors
+    ('e_pmGLON', '(mas/yr)', 'e_pmGLON'),
+    ('e_pmGLAT', '(mas/yr)', 'e_pmGLAT'),
+]
+
+# Gaia DR2 format with only obs data
+gaiadr2_columns = [
+    ('RA_true', '(degree)', 0),
+    ('DEC_true', '(degree)', 1),
+    ('Plx_true', '(mas)', 2),
+    ('pmRA_true', '(mas/yr)', 3),
+    ('pmDEC_true', '(mas/yr)', 4),
+    ('HRV_true', '(km/s)', 5),
+    # observed
+    ('ra', '(degree)', 6),
+    ('dec', '(degree)', 7),
+    ('parallax', '(mas)', 8),
+    ('pmra', '(mas/yr)', 9),
+    ('pmdec', '(mas/yr)', 10),
+    ('radial_velocity', '(km/s)', 11),
+    # error
+    ('ra_error', '(degree)', 12),
+    ('dec_error', '(degree)', 13),
+    ('parallax_error', '(mas)', 14),
+    ('pmra_error', '(mas/yr)', 15),
+    ('pmdec_error', '(mas/yr)', 16),
+    ('radial_velocity_error', '(km/s)', 17),
+    # True
+    ('G_true', '(mag)', 18),
+    ('G_BP_true', '(mag)', 20),
+    ('G_RP_true', '(mag)', 21),
+    # Observed
+    ('phot_g_mean_mag', '(mag)', 22),
+    ('phot_bp_mean_mag', '(mag)', 24),
+    ('phot_rp_mean_mag', '(mag)', 25),
+    # no photometry error, because they should be with flux error
+    # True
+    ('Teff_true', '(K)', 30),
+    ('logg_true', '(dex)', 31),
+    ('[Fe/H]_true', '(dex)', 32),
+    ('Av_true', '(mag)', 33),
+    # Observed
+    ('teff_val', '(K)', 34),
+    ('a_g_val', '(mag)', 37),
+    # no stellar parameter errors
+    # V,VI,GRVS,Age
+    ('V', '(mag)', 42),
+    ('V-I', '(mag)', 43),
+    ('G_RVS', '(mag)', 44),
+    ('Age', '(Gyr)', 45),
+    # GLON and GLAT only true
+    ('l', '(degree)', 'GLON_true'),
+    ('b', '(degree)', 'GLAT_true'),
+    # pmGLON and pmGLAT true
+    ('pmGLON_true', '(mas/yr)', 'pmGLON_true'),
+    ('pmGLAT_true', '(mas/yr)', 'pmGLAT_true'),
+    # observed
+    ('pmGLON_obs', '(mas/yr)', 'pmGLON_obs'),
+    ('pmGLAT_obs', '(mas/yr)', 'pmGLAT_obs'),
+    # Errors
+    ('e_pmGLON', '(mas/yr)', 'e_pmGLON'),
+    ('e_pmGLAT', '(mas/yr)', 'e_pmGLAT'),
+]
+
+
+def table_columns(flagGaiaDR2):
+    """Column list of the normal or the Gaia DR2 layout."""
+    if flagGaiaDR2:
+        return gaiadr2_columns
+    return normal_columns
+
+
+def column_formats(flagGaiaDR2, precision='double'):
+    """FITS formats ('D' or 'E') of the columns for the precision policy.
+    """
+    formats = []
+    for name, unit, src in table_columns(flagGaiaDR2):
+        if isinstance(src, str):
+            double = precision == 'double' or src in double_galactic
+        else:
+            double = gaiaeout.column_prec(gaiaeout.columns[src],
+                                          precision) == 'd'
+        if double:
+            formats.append('D')
+        else:
+            formats.append('E')
+    return formats
+
+
+def to_degree(rdata):
+    """Convert the angles of the gaiaed-out.bin records from radian to
+    degree, in place.
+    """
+    for i in radian_columns:
+        rdata[:, i] = 180.0*rdata[:, i]/np.pi
+    return rdata
+
+
+def galactic_columns(rdata):
+    """Galactic coordinates of the records with the angles in degree.
+
+    Returns
+    -------
+    dict of GLON_true, GLAT_true, pmGLON_true, pmGLAT_true, pmGLON_obs,
+    pmGLAT_obs, e_pmGLON and e_pmGLAT
+    """
+    # positions are true, and the proper motions are rotated at the true
+    # positions.  NB: the errors are columns 12 and 13 (e_RA, e_DEC) as
+    # in the original ubgaiae2fits.py
+    l, b, pmlbs = coords.galactic(
+        rdata[:, 0], rdata[:, 1],
+        [(rdata[:, 3], rdata[:, 4]), (rdata[:, 9], rdata[:, 10]),
+         (rdata[:, 12], rdata[:, 13])])
+    gal = {}
+    gal['GLON_true'] = l
+    gal['GLAT_true'] = b
+    gal['pmGLON_true'], gal['pmGLAT_true'] = pmlbs[0]
+    gal['pmGLON_obs'], gal['pmGLAT_obs'] = pmlbs[1]
+    gal['e_pmGLON'], gal['e_pmGLAT'] = pmlbs[2]
+    return gal
+
+
+def column_arrays(rdata, flagGaiaDR2):
+    """(name, unit, array) of the columns of the FITS table.
+
+    Parameters
+    ----------
+    rdata : array
+        (N, 46) gaiaed-out.bin records with the angles in degree
+    flagGaiaDR2 : bool
+        Gaia DR2 format if True
+    """
+    gal = galactic_columns(rdata)
+    cols = []
+    for name, unit, src in table_columns(flagGaiaDR2):
+        if isinstance(src, str):
+            cols.append((name, unit, gal[src]))
+        else:
+            cols.append((name, unit, rdata[:, src]))
+    return cols
+
+
+def make_hdu(rdata, flagGaiaDR2, precision='double'):
+    """Binary table HDU of the records with the angles in degree."""
+    return pyfits.BinTableHDU.from_columns(
+        [pyfits.Column(name=name, unit=unit, format=fmt, array=arr)
+         for (name, unit, arr), fmt in
+         zip(column_arrays(rdata, flagGaiaDR2),
+             column_formats(flagGaiaDR2, precision))])
+
+
+def write_fits(outfile, rdata, flagGaiaDR2, precision='double'):
+    """Write the records with the angles in degree to a FITS file."""
+    tbhdu = make_hdu(rdata, flagGaiaDR2, precision)
+    tbhdu.writeto(outfile, clobber=True)
+
+
+def table_header(flagGaiaDR2, precision='double'):
+    """Primary header and table header without rows.
+
+    The headers are made once for each layout, and the cached headers
+    should not be changed.
+
+    Returns
+    -------
+    primary : string
+        primary header
+    header : pyfits.Header
+        table header with NAXIS2 = 0
+    header_string : string
+        the table header as written to the file
+    """
+    key = (flagGaiaDR2, precision)
+    if key not in _headers:
+        hdu = pyfits.BinTableHDU.from_columns(
+            [pyfits.Column(name=name, unit=unit, format=fmt,
+                           array=np.zeros(0))
+             for (name, unit, src), fmt in
+             zip(table_columns(flagGaiaDR2),
+                 column_formats(flagGaiaDR2, precision))])
+        hdul = pyfits.HDUList([pyfits.PrimaryHDU(), hdu])
+        hdul.update_extend()
+        _headers[key] = (hdul[0].header.tostring(), hdu.header,
+                         hdu.header.tostring())
+    return _headers[key]
+
+
+class FitsTableWriter(object):
+
+    """FITS binary table written block by block.
+
+    The primary header and the table header are written when the file is
+    opened, with NAXIS2 = 0.  The rows are appended by write, and close
+    pads the data to the FITS block size and writes the header again with
+    the number of rows.  Only one block of rows is kept in memory.
+
+    With nrows > 0, the table of an interrupted run is opened again and
+    the rows are appended after the first nrows rows.
+    """
+
+    def __init__(self, outfile, flagGaiaDR2, precision='double', nrows=0):
+        """
+        Parameters
+        ----------
+        outfile : string
+            output FITS file name
+        flagGaiaDR2 : bool
+            Gaia DR2 format if True
+        precision : string, optional
+            precision policy, 'double' or 'compact' (see gaiaeout.py)
+        nrows : integer, optional
+            number of rows already written to outfile.  The rows after
+            them are removed.
+        """
+        self.flagGaiaDR2 = flagGaiaDR2
+        self.nrows = nrows
+        formats = column_formats(flagGaiaDR2, precision)
+        # big endian, row by row
+        self.rowdtype = np.dtype(
+            [(name, {'D': '>f8', 'E': '>f4'}[fmt]) for (name, unit, src), fmt
+             in zip(table_columns(flagGaiaDR2), formats)])
+        # header of the table without rows
+        primary, self.header, self.header_string = table_header(
+            flagGaiaDR2, precision)
+        self.header_offset = len(primary)
+        if nrows > 0:
+            # the header is written again by close
+            self.f = open(outfile, 'r+b')
+            self.f.seek(self.header_offset+len(self.header_string)
+                        + nrows*self.rowdtype.itemsize)
+            self.f.truncate()
+        else:
+            self.f = open(outfile, 'wb')
+            self.f.write(primary)
+            self.f.write(self.header_string)
+
+    def write(self, rdata):
+        """Append the records with the angles in degree to the table."""
+        with stage('fits_columns') as st:
+            rows = np.empty(len(rdata), dtype=self.rowdtype)
+            for name, unit, arr in column_arrays(rdata, self.flagGaiaDR2):
+                rows[name] = arr
+            st.add(len(rows))
+        with stage('fits_write') as st:
+            self.f.write(rows.tostring())
+            st.add(len(rows))
+        self.nrows += len(rows)
+
+    def close(self):
+        """Pad the data and set the number of rows in the header."""
+        nbytes = self.f.tell()-self.header_offset-len(self.header_string)
+        if nbytes % fitsblock:
+            self.f.write('\0'*(fitsblock-nbytes % fitsblock))
+        # only the NAXIS2 card of the header is written again
+        icard = self.header.index('NAXIS2')
+        card = pyfits.Card('NAXIS2', self.nrows,
+                           self.header.comments['NAXIS2'])
+        self.f.seek(self.header_offset+80*icard)
+        self.f.write(card.image)
+        self.f.close()
@@ -0,0 +1,643 @@
+# vectorized version of ubgaiaerrors/gaia_errors_DR2.F
+# all the stars are processed in one call with numpy arrays
+
+"""Gaia errors (DR2 calibration) for arrays of stars.
+
+This is a numpy port of ``Gaia_errors``, ``ErrorsPiMag``, ``ErrorsVr``,
+``errorsAp`` and ``lininter`` in ``ubgaiaerrors/gaia_errors_DR2.F``, and
+of the per-star loop in ``ubgaiaerrors/main.F``.  The errors are the same
+as the Fortran code, but the random deviates are drawn from a numpy
+random generator instead of ``ran1``/``gasdev``, so the observed values
+are a different realisation.
+
+Examples
+--------
+
+    >>> rng = np.random.RandomState(1111)
+    >>> a, ao, ae, p, po, pe, ap, apo, ape = gaia_errors(
+    ...     22.0, 1.0, 1, V, VI, a, ap, rng)
+"""
+
+import os
+import numpy as np
+
+# mas in radian (const_math.h)
+mas = 1.0e-3*np.pi/180.0/3600.0
+
+# directory of the tables
+tabledir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'ubgaiaerrors')
+gfactorfile = os.path.join(tabledir, 'gfactor-Jun2013.dat')
+tablevrfile = os.path.join(tabledir, 'TableVr-Jun2015.dat')
+
+# tables read only once, like ifirst in Gaia_errors
+_tables = {}
+
+# number of random deviates per star: 6 astrometry, 4 photometry, 4 AP
+ndev = 14
+
+
+def read_gfactor(fname=gfactorfile):
+    """Read the geometrical factors.
+
+    Returns
+    -------
+    xsb : array
+        |sin(beta)| of the 20 rows
+    xg : array
+        (20, 5) geometrical factors of alpha*, delta, pi, mu_alpha*,
+        mu_delta
+    gmean : array
+        (5,) mean geometrical factors
+    """
+    with open(fname) as f:
+        lines = f.readlines()
+    rows = np.array([[float(v) for v in l.split()] for l in lines[1:21]])
+    gmean = np.array([float(v) for v in lines[21].split()[1:6]])
+    return rows[:, 0], rows[:, 1:6], gmean
+
+
+def read_tablevr(fname=tablevrfile):
+    """Read the radial velocity error coefficients.
+
+    Returns
+    -------
+    xvi, xavr, xbvr : array
+        (V-I)c, a and b of the 11 rows
+    """
+    rows = np.loadtxt(fname, comments='#')[:11]
+    return rows[:, 0], rows[:, 1], rows[:, 2]
+
+
+def _get_tables():
+    if not _tables:
+        xsb, xg, gmean = read_gfactor()
+        _tables['gfactor'] = xsb, xg, gmean
+        # the 5 geometrical factors share one table of |sin(beta)|,
+        # equally spaced from 0.025 to 0.975
+        _tables['gfactor_interp'] = UniformTable(xsb, xg)
+        xvi, xavr, xbvr = read_tablevr()
+        _tables['tablevr'] = xvi, xavr, xbvr
+        # the last row of TableVr-Jun2015.dat ((V-I)c=1.04) is smaller
+        # than the one before (1.23).  It is kept to give the same
+        # errors as the Fortran code.
+        _tables['tablevr_interp'] = LinearTable(
+            xvi, np.column_stack([xavr, xbvr]), ordered=False)
+    return _tables
+
+
+class LinearTable(object):
+
+    """Tabulated y(x) for the linear interpolation of arrays of x.
+
+    As lininter in Fortran, the interval is the one ending at the first
+    xa(i) which is not smaller than x, and the end values are used
+    outside of [xa(1),xa(n)].  The interval is found by binary search
+    in the running maximum of xa, which gives the same first xa(i) >= x
+    also if xa is not in increasing order.
+    """
+
+    def __init__(self, xa, ya, ordered=True):
+        """
+        Parameters
+        ----------
+        xa : array
+            (n,) x of the table
+        ya : array
+            (n,) or (n, k) y of the table, k functions of the same xa
+        ordered : bool, optional
+            if True, ValueError is raised unless xa is increasing
+        """
+        self.xa = np.array(xa, dtype=np.float64)
+        self.ya = np.array(ya, dtype=np.float64)
+        if len(self.xa) < 2 or len(self.ya) != len(self.xa):
+            raise ValueError('Table needs at least 2 rows of xa and ya')
+        # rows with xa(i) <= xa(i-1)
+        self.unordered = np.where(np.diff(self.xa) <= 0.0)[0]+1
+        if ordered and len(self.unordered) > 0:
+            raise ValueError('xa is not increasing at rows %s'
+                             % list(self.unordered))
+        self.xsearch = np.maximum.accumulate(self.xa)
+
+    def __call__(self, x):
+        """y at x, (N,) or (N, k) array."""
+        xa = self.xa
+        ya = self.ya
+        n = len(xa)
+        x = np.asarray(x, dtype=np.float64)
+        # first i with xa(i) >= x
+        i = np.searchsorted(self.xsearch, x, side='left')
+        i = np.clip(i-1, 0, n-2)
+        x0 = xa[i]
+        x1 = xa[i+1]
+        if ya.ndim > 1:
+            x = x[:, np.newaxis]
+            x0 = x0[:, np.newaxis]
+            x1 = x1[:, np.newaxis]
+        y = ((x-x0)/(x1-x0))*ya[i+1]+((x1-x)/(x1-x0))*ya[i]
+        y = np.where(x > xa[n-1], ya[n-1], y)
+        y = np.where(x < xa[0], ya[0], y)
+        return y
+
+
+class UniformTable(LinearTable):
+
+    """LinearTable of equally spaced xa.
+
+    The interval of x is found from (x-xa(1))/dx without binary search,
+    and x is limited to [xa(1),xa(n)] before the interpolation, instead
+    of replacing y outside.  The weights of the interval are computed
+    once for the k functions.  y is the same as the one of LinearTable.
+    """
+
+    def __init__(self, xa, ya, rtol=1.0e-6):
+        """
+        Parameters
+        ----------
+        xa, ya :
+            see LinearTable
+        rtol : float, optional
+            ValueError is raised if the intervals of xa differ by more
+            than rtol*dx
+        """
+        LinearTable.__init__(self, xa, ya, ordered=True)
+        n = len(self.xa)
+        self.dx = (self.xa[n-1]-self.xa[0])/(n-1)
+        if np.any(np.abs(np.diff(self.xa)-self.dx) > rtol*self.dx):
+            raise ValueError('xa is not equally spaced')
+
+    def __call__(self, x):
+        """y at x, (N,) or (N, k) array."""
+        xa = self.xa
+        n = len(xa)
+        x = np.clip(np.asarray(x, dtype=np.float64), xa[0], xa[n-1])
+        i = ((x-xa[0])/self.dx).astype(np.intp)
+        np.clip(i, 0, n-2, out=i)
+        # as LinearTable, x is in (xa(i),xa(i+1)] except in the first
+        # interval, also where x-xa(1) is rounded to the next interval
+        i += x > xa[i+1]
+        i -= (x <= xa[i]) & (i > 0)
+        x0 = xa[i]
+        x1 = xa[i+1]
+        w1 = (x-x0)/(x1-x0)
+        w0 = (x1-x)/(x1-x0)
+        if self.ya.ndim > 1:
+            w1 = w1[:, np.newaxis]
+            w0 = w0[:, np.newaxis]
+        return w1*self.ya[i+1]+w0*self.ya[i]
+
+
+def lininter(xa, ya, x):
+    """Linear interpolation for an array of x, as lininter in Fortran.
+
+    See LinearTable.  The tables used many times should be made once
+    with LinearTable instead.
+    """
+    return LinearTable(xa, ya, ordered=False)(x)
+
+
+def errors_ap(G):
+    """Errors of the atmospheric parameters (Teff, logg, [Fe/H], A0).
+
+    Returns (N, 4) array.
+    """
+    ape = np.empty((len(G), 4))
+    # Fitting |Teff_eaneas_pq - Teff_real|
+    ape[:, 0] = 630.3-107.54*G+4.9682*G**2
+    ape[:, 1] = 0.49865-0.04432*G+0.0017055*G**2
+    ape[:, 2] = 0.81192-0.12226*G+0.0056669*G**2
+    ape[:, 3] = 0.56387-0.093435*G+0.0042024*G**2
+    return ape
+
+
+def pimag_base(V, VI):
+    """Gaia photometry and the errors before the scaling with the mission
+    length and CAfactor (see scale_pimag).
+
+    Returns
+    -------
+    p : array
+        (N, 4) G, G_BP-G_RP, G_BP, G_RP
+    empi : array
+        parallax error in micro-arcsec for 5 years and CAfactor=1
+    sigG, sigBP, sigRP : array
+        errors of G, G_BP and G_RP for 5 years, before the DR2 factor
+    """
+    vi = VI
+    p = np.empty((len(V), 4))
+    p[:, 1] = -0.0660+1.2061*vi-0.0614*vi*vi+0.0041*vi**3
+    p[:, 0] = V-0.0257-0.0924*vi-0.1623*vi*vi+0.0090*vi**3
+    # BR and PR
+    p[:, 2] = V-(0.0643-0.3266*vi+0.0887*(vi**2)-0.0050*(vi**3))
+    p[:, 3] = V-(-0.0017+0.8794*vi+0.0273*(vi**2)-0.0008*(vi**3))
+
+    # Astrometric Error
+    # After Comissioning Nov 2014
+    z = np.maximum(10**(0.4*(12.0-15.0)), 10**(0.4*(p[:, 0]-15.0)))
+    empi = np.sqrt(-1.631+680.766*z+32.732*z**2)*(0.986+(1.0-0.986)*vi)
+
+    # Photometric Errors
+    sigG = 0.001*np.sqrt(0.04895*z**2+1.8633*z+0.0001985)
+    sigG = sigG/np.sqrt(70.0)
+
+    z = np.maximum(10**(0.4*(11.0-15.0)), 10**(0.4*(p[:, 0]-15.0)))
+
+    a = -0.000562*vi**3+0.044390*vi**2+0.355123*vi+1.043270
+    b = -0.000400*vi**3+0.018878*vi**2+0.195768*vi+1.465592
+    c = 0.000262*vi**3+0.060769*vi**2-0.205807*vi-1.866968
+    sigBP = 0.001*np.sqrt((10.0**a)*(z**2)+(10.0**b)*z+10.0**c)
+    sigBP = sigBP/np.sqrt(70.0)
+
+    a = -0.007597*vi**3+0.114126*vi**2-0.636628*vi+1.615927
+    b = -0.003803*vi**3+0.057112*vi**2-0.318499*vi+1.783906
+    c = -0.001923*vi**3+0.027352*vi**2-0.091569*vi-3.042268
+    sigRP = 0.001*np.sqrt((10.0**a)*(z**2)+(10.0**b)*z+10.0**c)
+    sigRP = sigRP/np.sqrt(70.0)
+    return p, empi, sigG, sigBP, sigRP
+
+
+def scale_pimag(base, factorL, CAfactor):
+    """Photometric errors and parallax error of pimag_base for the mission
+    length (factorL=sqrt(60/month)) and CAfactor.
+
+    Returns
+    -------
+    p, pe, empi : see errors_pimag
+    """
+    p, empi, sigG, sigBP, sigRP = base
+    pe = np.empty((len(p), 4))
+    empi = empi*factorL*CAfactor
+    empi = np.where(np.logical_and(p[:, 0] < 15.0, empi < 40.0), 40.0, empi)
+
+    # from DR2 website
+    pe[:, 0] = np.maximum(sigG*factorL*5.0, 0.001)
+    sigBP = sigBP*factorL
+    sigRP = sigRP*factorL
+
+    # from DR2 websie
+    pe[:, 2] = np.maximum(sigBP*5.0, 0.001)
+    pe[:, 3] = np.maximum(sigRP*5.0, 0.001)
+    # We assume there is no correlation among colours
+    pe[:, 1] = np.sqrt(sigBP**2+sigRP**2)
+
+    # too faint. Fortran leaves pe(3) and pe(4) as they were, but
+    # here they are set to the same value as pe(1) and pe(2).
+    faint = p[:, 0] > 20.0
+    empi = np.where(faint, 999999.999, empi)
+    pe[faint, :] = 99.999
+    return p, pe, empi
+
+
+def errors_pimag(factorL, CAfactor, V, VI):
+    """Gaia photometry, photometric errors and parallax error.
+
+    Returns
+    -------
+    p : array
+        (N, 4) G, G_BP-G_RP, G_BP, G_RP
+    pe : array
+        (N, 4) errors of p
+    empi : array
+        parallax error in micro-arcsec
+    """
+    return scale_pimag(pimag_base(V, VI), factorL, CAfactor)
+
+
+def errors_vr(V, VI):
+    """Radial velocity error (km/s) and G_RVS."""
+    GRVS = V-0.0119-1.2092*VI+0.0188*VI*VI+0.0005*VI*VI*VI
+    vr = _get_tables()['tablevr_interp'](VI)
+    avr = vr[:, 0]
+    bvr = vr[:, 1]
+    sigVr = 1.0+bvr*np.exp(avr*(V-12.7))
+    return sigVr, GRVS
+
+
+def sin_beta(alpha, delta):
+    """|sin(beta)| of the ecliptic latitude of (alpha, delta) in radian."""
+    return np.abs(0.9175*np.sin(delta)-0.3978*np.cos(delta)*np.sin(alpha))
+
+
+def geometrical_factors(jflag, alpha=None, delta=None):
+    """Geometrical factors of alpha*, delta, pi, mu_alpha* and mu_delta.
+
+    Parameters
+    ----------
+    jflag : int
+        1: mean factors, -1: factors of the scanning law at (alpha, delta)
+    alpha, delta : array, optional
+        (N,) position (radian), needed for jflag=-1
+
+    Returns
+    -------
+    (5,) array for jflag=1, (N, 5) array for jflag=-1
+    """
+    if jflag > 0:
+        return _get_tables()['gfactor'][2]
+    elif jflag < 0:
+        return _get_tables()['gfactor_interp'](sin_beta(alpha, delta))
+    raise ValueError('jflag should be 1 or -1')
+
+
+def sigma_base(V, VI, a, scanning=False):
+    """Parts of the errors of N stars which do not depend on the mission
+    length, CAfactor and jflag > 0, to be scaled by scale_sigmas.
+
+    Parameters
+    ----------
+    V, VI, a :
+        see gaia_errors
+    scanning : bool, optional
+        add the geometrical factors of the scanning law (jflag=-1)
+
+    Returns
+    -------
+    dict of the arrays
+    """
+    V = np.asarray(V, dtype=np.float64)
+    VI = np.asarray(VI, dtype=np.float64)
+    a = np.array(a, dtype=np.float64, ndmin=2)
+    base = {}
+    base['pimag'] = pimag_base(V, VI)
+    base['sigVr'], base['GRVS'] = errors_vr(V, VI)
+    if scanning:
+        base['g'] = geometrical_factors(-1, a[:, 0], a[:, 1])
+    base['ape'] = errors_ap(base['pimag'][0][:, 0])
+    return base
+
+
+def scale_sigmas(base, month, CAfactor, jflag):
+    """Gaia photometry and errors of sigma_base for month, CAfactor and
+    jflag.
+
+    The errors of the parallax and magnitudes scale with
+    factorL=sqrt(60/month) and CAfactor, and the ones of the proper
+    motions with factorL**3, with the lower and upper limits of
+    errors_pimag.
+
+    Returns
+    -------
+    p, pe, ae, ape : see gaia_sigmas
+    """
+    if jflag == 0:
+        raise ValueError('jflag should be 1 or -1')
+    xsb, xg, gmean = _get_tables()['gfactor']
+
+    factorL = np.sqrt(60.0/month)
+
+    # Get Gaia errors in parallax,magnitudes and Vr
+    p, pe, empi = scale_pimag(base['pimag'], factorL, CAfactor)
+    ae = np.empty((len(p), 6))
+    ae[:, 5] = base['sigVr']
+
+    # Output errors on parallax and proper motion will be in mas
+    empi = empi/1.0e3
+
+    if jflag > 0:
+        # Mean errors (from mean g-geometrical factor)
+        ae[:, 2] = empi
+        ae[:, 0] = gmean[0]*empi
+        ae[:, 1] = gmean[1]*empi
+        ae[:, 3] = gmean[3]*empi*(factorL**2)
+        ae[:, 4] = gmean[4]*empi*(factorL**2)
+    else:
+        # Errors depending on the scanning law
+        g = base['g']
+        ae[:, 0:5] = g*empi[:, np.newaxis]
+        # parallax improve t^-0.5, proper motion improve t^-1.5
+        ae[:, 2] = ae[:, 2]*factorL
+        ae[:, 3] = ae[:, 3]*(factorL**3)
+        ae[:, 4] = ae[:, 4]*(factorL**3)
+
+    return p, pe, ae, base['ape']
+
+
+def gaia_sigmas(month, CAfactor, jflag, V, VI, a):
+    """Gaia photometry and errors of N stars, without random deviates.
+
+    Parameters
+    ----------
+    month, CAfactor, jflag, V, VI, a :
+        see gaia_errors
+
+    Returns
+    -------
+    p, pe : array
+        (N, 4) true and error of G, G_BP-G_RP, G_BP, G_RP
+    ae : array
+        (N, 6) errors of the astrometry
+    ape : array
+        (N, 4) errors of the atmospheric parameters
+    """
+    if jflag == 0:
+        raise ValueError('jflag should be 1 or -1')
+    base = sigma_base(V, VI, a, scanning=jflag < 0)
+    return scale_sigmas(base, month, CAfactor, jflag)
+
+
+def observe(a, ae, p, pe, ap, ape, rng=None, dev=None):
+    """Observed values of N stars from their true values and errors.
+
+    Parameters
+    ----------
+    a, ae, p, pe, ap, ape :
+        see gaia_sigmas
+    rng :
+        see gaia_errors
+    dev : array, optional
+        (N, 14) standard normal deviates of the stars, drawn from rng if
+        not given
+
+    Returns
+    -------
+    a, ao, ae : array
+        (N, 6) true, observed and error of the astrometry
+    po : array
+        (N, 4) observed photometry
+    apo : array
+        (N, 4) observed atmospheric parameters
+    """
+    if rng is None:
+        rng = np.random.RandomState()
+    a = np.array(a, dtype=np.float64, ndmin=2)
+    ap = np.array(ap, dtype=np.float64, ndmin=2)
+    ae = ae.copy()
+
+    # one set of random deviates for each star
+    if dev is None:
+        dev = rng.standard_normal((len(a), ndev))
+
+    # alpha_{*}=alpha*cos(delta) and (alpha*,delta) in mas
+    at = a.copy()
+    at[:, 0] = at[:, 0]*np.cos(at[:, 1])/mas
+    at[:, 1] = at[:, 1]/mas
+    ao = at+ae*dev[:, 0:6]
+    # back to radians
+    at[:, 0] = at[:, 0]*mas
+    at[:, 1] = at[:, 1]*mas
+    ao[:, 0] = ao[:, 0]*mas
+    ao[:, 1] = ao[:, 1]*mas
+    # alpha_{*} -> alpha
+    ao[:, 0] = ao[:, 0]/np.cos(ao[:, 1])
+    at[:, 0] = at[:, 0]/np.cos(at[:, 1])
+    # as in Gaia_errors, ae(1) is overwritten with alpha/cos(delta)
+    ae[:, 0] = at[:, 0]/np.cos(at[:, 1])
+
+    # observed photometry and atmospheric parameters
+    po = p+pe*dev[:, 6:10]
+    apo = ap+ape*dev[:, 10:14]
+
+    return at, ao, ae, po, apo
+
+
+def gaia_errors(month, CAfactor, jflag, V, VI, a, ap, rng=None):
+    """Add Gaia errors to N stars.
+
+    Parameters
+    ----------
+    month : float
+        mission length in months, 60=5 years
+    CAfactor : float
+        calibration astrometric factor, 1 means no calibration errors
+    jflag : int
+        1: errors from mean geometrical factors, -1: errors with
+        the scanning law
+    V, VI : array
+        (N,) V apparent magnitude and observed (V-I) colour
+    a : array
+        (N, 6) alpha (rad), delta (rad), parallax (mas),
+        mu_alpha* (mas/yr), mu_delta (mas/yr), Vr (km/s)
+    ap : array
+        (N, 4) Teff (K), logg (dex), [Fe/H] (dex), A0 (mag)
+    rng : numpy.random.RandomState or philox.StarRandom, optional
+        random generator for the observed values.  It has to provide
+        ``standard_normal(size)``.  With philox.StarRandom, the observed
+        values of each star are independent of the other stars.
+
+    Returns
+    -------
+    a, ao, ae : array
+        (N, 6) true, observed and error of the astrometry
+    p, po, pe : array
+        (N, 4) true, observed and error of G, G_BP-G_RP, G_BP, G_RP
+    ap, apo, ape : array
+        (N, 4) true, observed and error of the atmospheric parameters
+    """
+    p, pe, ae, ape = gaia_sigmas(month, CAfactor, jflag, V, VI, a)
+    a, ao, ae, po, apo = observe(a, ae, p, pe, ap, ape, rng)
+    ap = np.array(ap, dtype=np.float64, ndmin=2)
+    return a, ao, ae, p, po, pe, ap, apo, ape
+
+
+def ubgaiae_input(stars):
+    """Input of gaia_errors from ubgaiaein.bin records, as main.F.
+
+    Parameters
+    ----------
+    stars : array
+        (N, 13) alpha (deg), delta (deg), distance (pc), mu_alpha,
+        mu_delta (mas/yr), Vr (km/s), Teff, logg, [Fe/H], Av, V-I, V, Age
+
+    Returns
+    -------
+    a, ap, V, VI, Age : array
+    """
+    stars = np.array(stars, dtype=np.float64, ndmin=2)
+    ns = len(stars)
+    delta = stars[:, 1]
+    a = np.empty((ns, 6))
+    a[:, 0] = stars[:, 0]*np.pi/180.0
+    a[:, 1] = delta*np.pi/180.0
+    # distance (pc) -> parallax (mas)
+    a[:, 2] = 1000.0/stars[:, 2]
+    # as main.F, the cosine is taken of delta in degrees
+    a[:, 3] = stars[:, 3]*np.cos(delta)
+    a[:, 4] = stars[:, 4]
+    a[:, 5] = stars[:, 5]
+    return a, stars[:, 6:10], stars[:, 11], stars[:, 10], stars[:, 12]
+
+
+def ubgaiae_sweep(stars, configs, rngs):
+    """Gaia errors of ubgaiaein.bin records for several configurations.
+
+    The photometry and the parts of the errors which do not depend on
+    month and CAfactor are computed once (sigma_base) and scaled for each
+    configuration.  The random deviates of each realization are drawn
+    once and used for all the configurations, so that the records of a
+    configuration are the same as the ones of ubgaiae_realizations.
+
+    Parameters
+    ----------
+    stars :
+        see ubgaiae_input
+    configs : list
+        (month, CAfactor, jflag) of the configurations, see gaia_errors
+    rngs : list
+        random generator of each realization, see gaia_errors
+
+    Returns
+    -------
+    (C, K, N, 46) array of the gaiaed-out.bin records of the C
+    configurations and K realizations: a, ao, ae, p, po, pe, ap, apo,
+    ape, V, V-I, G_RVS, Age
+    """
+    a, ap, V, VI, Age = ubgaiae_input(stars)
+    for month, CAfactor, jflag in configs:
+        if jflag == 0:
+            raise ValueError('jflag should be 1 or -1')
+    base = sigma_base(V, VI, a,
+                      scanning=any(jflag < 0 for m, c, jflag in configs))
+    GRVS = V-0.0119-1.2092*VI+0.0188*(VI**2)+0.0005*(VI**3)
+    rest = np.column_stack([V, VI, GRVS, Age])
+
+    sigmas = [scale_sigmas(base, month, CAfactor, jflag)
+              for month, CAfactor, jflag in configs]
+    rdata = np.empty((len(configs), len(rngs), len(a), 46))
+    for k, rng in enumerate(rngs):
+        dev = rng.standard_normal((len(a), ndev))
+        for c, (p, pe, ae, ape) in enumerate(sigmas):
+            at, ao, aek, po, apo = observe(a, ae, p, pe, ap, ape, dev=dev)
+            rdata[c, k] = np.hstack([at, ao, aek, p, po, pe, ap, apo, ape,
+                                     rest])
+    return rdata
+
+
+def ubgaiae_realizations(stars, month, CAfactor, jflag, rngs):
+    """Several realizations of the Gaia errors for ubgaiaein.bin records.
+
+    The errors are computed once, and the observed values are drawn
+    for each random generator.
+
+    Parameters
+    ----------
+    stars :
+        see ubgaiae_input
+    month, CAfactor, jflag :
+        see gaia_errors
+    rngs : list
+        random generator of each realization, see gaia_errors
+
+    Returns
+    -------
+    (K, N, 46) array of the gaiaed-out.bin records of the K
+    realizations: a, ao, ae, p, po, pe, ap, apo, ape, V, V-I, G_RVS, Age
+    """
+    return ubgaiae_sweep(stars, [(month, CAfactor, jflag)], rngs)[0]
+
+
+def ubgaiae_errors(stars, month, CAfactor, jflag, rng=None):
+    """Gaia errors for ubgaiaein.bin records, as main.F.
+
+    Parameters
+    ----------
+    stars :
+        see ubgaiae_input
+    month, CAfactor, jflag, rng :
+        see gaia_errors
+
+    Returns
+    -------
+    (N, 46) array of the gaiaed-out.bin records: a, ao, ae, p, po, pe,
+    ap, apo, ape, V, V-I, G_RVS, Age
+    """
+    return ubgaiae_realizations(stars, month, CAfactor, jflag, [rng])[0]
@@ -0,0 +1,170 @@
+# access to the output files of the Gaia errors code
+# gaiaei-out.bin: number of stars
+# gaiaed-out.bin: one record of 46 numbers for each star
+
+"""Named columns of gaiaed-out.bin.
+
+The records of gaiaed-out.bin are mapped with a structured dtype, whose
+fields are the record markers and the named columns, so that only the
+pages of the file used are read.
+
+The precision of the columns is given by a policy: 'double' (all the
+columns in double precision, as the Fortran code) or 'compact' (the
+positions and parallaxes, double_columns, in double precision and the
+others in single precision).  The policy of a file is found from the
+length of its records.
+
+Examples
+--------
+
+    >>> rdata = memmap_gaiaed('gaiaed-out.bin')
+    >>> plx = rdata['plx_true']
+    >>> eplx = rdata['e_plx']
+"""
+
+import os
+import struct
+import numpy as np
+from FortranFile import FortranFile
+
+# column names in the order of main.F
+# a, ao, ae: astrometry (radian, radian, mas, mas/yr, mas/yr, km/s)
+_astrom = ['alpha', 'delta', 'plx', 'pmra', 'pmdec', 'vrad']
+# p, po, pe: photometry (mag)
+_phot = ['G', 'BPRP', 'BP', 'RP']
+# ap, apo, ape: atmospheric parameters (K, dex, dex, mag)
+_ap = ['Teff', 'logg', 'FeH', 'Av']
+columns = [c+'_true' for c in _astrom]+[c+'_obs' for c in _astrom] \
+    +['e_'+c for c in _astrom] \
+    +[c+'_true' for c in _phot]+[c+'_obs' for c in _phot] \
+    +['e_'+c for c in _phot] \
+    +[c+'_true' for c in _ap]+[c+'_obs' for c in _ap] \
+    +['e_'+c for c in _ap] \
+    +['V', 'VI', 'G_RVS', 'Age']
+ncols = len(columns)
+
+# precision policies
+precisions = ['double', 'compact']
+# columns kept in double precision with the 'compact' policy
+double_columns = ['alpha_true', 'delta_true', 'plx_true',
+                  'alpha_obs', 'delta_obs', 'plx_obs']
+
+
+def column_prec(name, precision='double', prec='d'):
+    """struct precision character of the column for the policy."""
+    if precision == 'double' or name in double_columns:
+        return prec
+    elif precision == 'compact':
+        return 'f'
+    raise ValueError('precision must be one of %s' % precisions)
+
+
+def gaiaed_dtype(endian='@', header_prec='i', prec='d', precision='double'):
+    """Structured dtype of a gaiaed-out.bin record with its markers.
+
+    As FortranFile._record_dtype, the sizes are the ones of struct with
+    endian ('@' is the native size, e.g. 8 bytes for 'l' on LP64), and
+    '@' is replaced by '=' only in the numpy types.
+    """
+    npendian = endian.replace('@', '=')
+    header = npendian+'i%d' % struct.calcsize(endian+header_prec)
+    fields = []
+    for c in columns:
+        cprec = column_prec(c, precision, prec)
+        fields.append((c, npendian+'f%d' % struct.calcsize(endian+cprec)))
+    return np.dtype([('head', header)]+fields+[('tail', header)])
+
+
+def detect_precision(fname='gaiaed-out.bin', endian='@', header_prec='i',
+                     prec='d'):
+    """Precision policy of gaiaed-out.bin from its first record marker.
+
+    'double' is returned for an empty file.
+    """
+    f = FortranFile(fname, endian=endian, header_prec=header_prec)
+    head = f.read(struct.calcsize(f.ENDIAN+f.HEADER_PREC))
+    f.close()
+    if len(head) == 0:
+        return 'double'
+    length_bytes = struct.unpack(f.ENDIAN+f.HEADER_PREC, head)[0]
+    for precision in precisions:
+        dt = gaiaed_dtype(endian, header_prec, prec, precision)
+        if dt.itemsize-2*dt['head'].itemsize == length_bytes:
+            return precision
+    raise IOError('Unknown record length of gaiaed-out.bin')
+
+
+def write_gaiaed(f, rdata, precision='double'):
+    """Write (N, 46) rdata as gaiaed-out.bin records to FortranFile f."""
+    dt = gaiaed_dtype(f.ENDIAN, f.HEADER_PREC, 'd', precision)
+    rec = np.empty(len(rdata), dtype=dt)
+    rec['head'] = dt.itemsize-2*dt['head'].itemsize
+    for i, c in enumerate(columns):
+        rec[c] = rdata[:, i]
+    rec['tail'] = rec['head']
+    f.write(rec.tostring())
+
+
+def read_gaiaed(f, n, precision='double'):
+    """Read n gaiaed-out.bin records from FortranFile f.
+
+    Returns
+    -------
+    (n, 46) array in double precision
+    """
+    dt = gaiaed_dtype(f.ENDIAN, f.HEADER_PREC, 'd', precision)
+    rec = np.fromfile(f, dtype=dt, count=n)
+    if len(rec) != n:
+        raise IOError('Could not read enough data.'
+                      '  Wanted %d records, got %d.' % (n, len(rec)))
+    length_bytes = dt.itemsize-2*dt['head'].itemsize
+    if np.any(rec['head'] != length_bytes) or \
+       np.any(rec['tail'] != length_bytes):
+        raise IOError('Error reading record from data file')
+    rdata = np.empty((n, ncols))
+    for i, c in enumerate(columns):
+        rdata[:, i] = rec[c]
+    return rdata
+
+
+def read_nstars(fname='gaiaei-out.bin'):
+    """Number of stars in gaiaei-out.bin"""
+    f = FortranFile(fname)
+    nset = f.readInts()[0]
+    f.close()
+    return nset
+
+
+def memmap_gaiaed(fname='gaiaed-out.bin', nset=None, mode='r',
+                  endian='@', header_prec='i', prec='d', precision=None):
+    """Map gaiaed-out.bin to a structured array.
+
+    Parameters
+    ----------
+    fname : string
+        gaiaed-out.bin file name
+    nset : integer, optional
+        Number of stars.  The default is from the size of the file.
+    mode : string, optional
+        numpy.memmap mode, 'r' or 'c' (copy-on-write)
+    precision : string, optional
+        precision policy.  The default is from the length of the records.
+
+    Returns
+    -------
+    numpy.memmap with the fields of ``columns``, or an empty structured
+    array if there is no star (e.g. no star is brighter than vmaglim)
+    """
+    if precision is None:
+        precision = detect_precision(fname, endian, header_prec, prec)
+    dt = gaiaed_dtype(endian, header_prec, prec, precision)
+    # an empty file cannot be mapped
+    if nset == 0 or (nset is None and os.path.getsize(fname) == 0):
+        return np.zeros(0, dtype=dt)
+    rdata = np.memmap(fname, dtype=dt, mode=mode, shape=nset)
+    # check the markers of the first and last records
+    length_bytes = dt.itemsize-2*dt['head'].itemsize
+    if len(rdata) > 0 and (rdata['head'][0] != length_bytes
+                           or rdata['tail'][-1] != length_bytes):
+        raise IOError('Error reading record from data file')
+    return rdata
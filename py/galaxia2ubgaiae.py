@@ -10,7 +10,12 @@ import matplotlib.cm as cm
 import matplotlib.gridspec as gridspec
 from scipy import constants as const
 from FortranFile import FortranFile
+import galaxia_ingest
+import asciiout
+import multiprocessing
 import struct
+import sys
+import runreport
 
 # output option 0: off, 1: on
 # output UB Gaia error code ASCII data
@@ -22,213 +27,195 @@ flagebf=0
 # plot 
 flagplot=1
 
+# ASCII output filename (gzip compressed if it ends with .gz)
+ascfile='ubgaiae-in.asc'
+# number of processes to format the ASCII data
+nprocasc=1
+
 # input filename
+# a glob pattern or a list of the part files of a galaxia run can also be
+# given, e.g. inputfile='../galaxia/galaxy1-part*.ebf'.  The selected
+# stars are merged in the order of the files (sorted by name for a
+# pattern).
 inputfile='../galaxia/galaxy1.ebf'
+# number of processes to read and select the chunks of the input files
+nprocin=1
 # ebf output filename
 outputfile='galaxy1eq.ebf'
+# source of the stars of ubgaiaein.bin: the range of the star IDs
+# (the index in ubgaiaein.bin) of each input file
+sourcefile='ubgaiaein-sources.txt'
 
 # magnitude limit
 vmaglim=13.0
 
-# reading the data
-px=ebf.read(inputfile,'/px')
-py=ebf.read(inputfile,'/py')
-pz=ebf.read(inputfile,'/pz')
-vy=ebf.read(inputfile,'/vy')
-vx=ebf.read(inputfile,'/vx')
-vz=ebf.read(inputfile,'/vz')
-glon=ebf.read(inputfile,'/glon')
-glat=ebf.read(inputfile,'/glat')
-age=ebf.read(inputfile,'/Age')
-feh=ebf.read(inputfile,'/FeH')
-alfe=ebf.read(inputfile,'/Alpha')
-smass=ebf.read(inputfile,'/Smass')
-rad=ebf.read(inputfile,'/rad')
-center=ebf.read(inputfile,'/Center')
-teff=ebf.read(inputfile,'/Teff')
-logg=ebf.read(inputfile,'/Grav')
-lum=ebf.read(inputfile,'/lum')
-mumag=ebf.read(inputfile,'/ubv_u')
-mbmag=ebf.read(inputfile,'/ubv_b')
-mvmag=ebf.read(inputfile,'/ubv_v')
-mrmag=ebf.read(inputfile,'/ubv_r')
-mimag=ebf.read(inputfile,'/ubv_i')
-mjmag=ebf.read(inputfile,'/ubv_j')
-mhmag=ebf.read(inputfile,'/ubv_h')
-mkmag=ebf.read(inputfile,'/ubv_k')
-exbvs=ebf.read(inputfile,'/exbv_schlegel')
-
-# solar position and velocity
-print 'Solar position assumed in Galaxia =',center[0],center[1],center[2]
-print '      velocity =',center[3],center[4],center[5]
-
-ns=len(mumag)
+# number of rows read at once from the galaxia output
+# (0: all the rows at once)
+nchunk=1000000
 
-# apparent magnitude
-vmag=mvmag+5.0*np.log10(rad*100.0)
-imag=mimag+5.0*np.log10(rad*100.0)
-# extinction
-av=exbvs*3.315
-ai=exbvs*1.940
-# add extinction
-vmage=vmag+av
-image=imag+ai
-vicole=vmage-image
-
-# selecting apparent magnitude 
-sindx=np.where(vmage < vmaglim)
-ns=np.size(sindx)
-print 'Ns(V<',vmaglim,')=',ns
-pxs=px[sindx]
-pys=py[sindx]
-pzs=pz[sindx]
-vxs=vx[sindx]
-vys=vy[sindx]
-vzs=vz[sindx]
-glonas=glon[sindx]
-glatas=glat[sindx]
-vmages=vmage[sindx]
-vicoles=vicole[sindx]
+# skip the run if the output files are up to date, and continue an
+# interrupted run from the last chunk written (see checkpoint.py)
+# 0: off, 1: on
+flagresume=1
 
-# adjusting the position
-# no correction for the position
-# pxs=pxs+center[0]
-# pys=pys+center[1]
-# pzs=pzs+center[2]
-# vxs=vxs+center[3]
-# vys=vys+center[4]
-# vzs=vzs+center[5]
+# run report with the time and memory of the stages (see runreport.py)
+# ('': no report)
+reportfile='galaxia2ubgaiae-report.json'
+# cProfile statistics ('': no profile)
+profilefile=''
+runreport.start('galaxia2ubgaiae.py',{'inputfile':inputfile
+  ,'vmaglim':vmaglim,'nchunk':nchunk,'nprocasc':nprocasc
+  ,'nprocin':nprocin},profilefile=profilefile)
 
-# output ascii data for test
-#f=open('testi-part.dat','w')
-#i=0
-#while i < ns:
-# print >>f, "%f %f %f %f %f %f" %(pxs[i]-8.0,pys[i],pzs[i]
-#  ,vxs[i],vys[i]+vrotmsun,vzs[i])
-# i+=1
-#f.close()
-
-# 3 axes in Galactic coordinate
-# North Celestial Pole (z-axis)
-lzeq=np.radians(122.93193212)
-bzeq=np.radians(27.12835496)
-# RA,DEC=0,0 (x-axis)
-lxeq=np.radians(96.33723825)
-bxeq=np.radians(-60.18853909)
-#  RA,DEC=90,0 (y-axis)
-lyeq=np.radians(206.98916373)
-byeq=np.radians(-11.42442440)
-# transformation matrix (though it is array in python)
-tmateqga=np.array([
-  [np.cos(lxeq)*np.cos(bxeq),np.sin(lxeq)*np.cos(bxeq),np.sin(bxeq)],
-  [np.cos(lyeq)*np.cos(byeq),np.sin(lyeq)*np.cos(byeq),np.sin(byeq)],
-  [np.cos(lzeq)*np.cos(bzeq),np.sin(lzeq)*np.cos(bzeq),np.sin(bzeq)]
-])
-
-# transfer the coordinate: x-y plane: Galactic plane -> Cerestial equator
-
-# position
-# position in Galactic cartesian coordinate
-posgas=np.vstack([pxs,pys,pzs])
-# transfer to equatorial cartesian coordinate
-poseqs=np.dot(tmateqga,posgas)
-
-# velocity
-# velocity in Galactic cartesian coordinate
-velgas=np.vstack([vxs,vys,vzs])
-# transfer to equatorial cartesian coordinate
-veleqs=np.dot(tmateqga,velgas)
+inputfiles=galaxia_ingest.input_files(inputfile)
+print 'Input files=',', '.join(inputfiles)
 
+# the output files depend on the input file and these parameters
+outputfiles=[]
+if flagube:
+  outputfiles.append('ubgaiaein.bin')
+  outputfiles.append(sourcefile)
+if flagubeasc:
+  outputfiles.append(ascfile)
+if flagebf:
+  outputfiles.append(outputfile)
+if flagplot:
+  outputfiles.append('galaxia-stars.png')
+params={'vmaglim':vmaglim,'nchunk':nchunk,'flagubeasc':flagubeasc
+  ,'flagube':flagube,'flagebf':flagebf,'flagplot':flagplot}
+# number of chunks done before
+ichunk=0
+if flagresume:
+  import checkpoint
+  import coords
+  # the outputs are made again when the code changes
+  # (FortranFile is the class here)
+  modules=[__file__,galaxia_ingest,coords,asciiout,sys.modules['FortranFile']]
+  manifest=checkpoint.Manifest('galaxia2ubgaiae',inputfiles,outputfiles
+    ,params,modules=modules)
+  if manifest.is_done():
+    print ', '.join(outputfiles),'are up to date'
+    sys.exit()
+  ichunk,state=manifest.resume()
 
-# R.A. Dec. 
-radxys=np.sqrt(np.power(poseqs[0,:],2)+np.power(+poseqs[1,:],2))
-rads=np.sqrt(np.power(poseqs[0,:],2)+np.power(poseqs[1,:],2)
-  +np.power(poseqs[2,:],2))
-# R.A.
-alps=np.degrees(np.arccos(poseqs[0,:]/radxys))
-i=0
-while i<ns:
- if poseqs[1,i] < 0.0:
-   alps[i]=360.0-alps[i]
- i+=1
-dels=np.degrees(np.arcsin(poseqs[2,:]/rads))
-equs=np.vstack([alps,dels])
+# solar position and velocity
+center=galaxia_ingest.check_center(inputfiles)
+print 'Solar position assumed in Galaxia =',center[0],center[1],center[2]
+print '      velocity =',center[3],center[4],center[5]
 
-# radial velocity
-vrads=(veleqs[0,:]*poseqs[0,:]+veleqs[1,:]*poseqs[1,:]+veleqs[2,:]*poseqs[2,:])/rads
-# proper motion
-# mu_alpha (km/s)
-valps=(-veleqs[0,:]*poseqs[1,:]+veleqs[1,:]*poseqs[0,:])/radxys
-# mu_delta (km/s)
-# vrad in x-y plane
-vradxys=(veleqs[0,:]*poseqs[0,:]+veleqs[1,:]*poseqs[1,:])/radxys
-vdels=(-vradxys*poseqs[2,:]+veleqs[2,:]*radxys)/rads
+# ASCII data for UB Fortran code
+if flagubeasc:
+  if ichunk > 0:
+    fasc=asciiout.open_ascii(ascfile,'a')
+  else:
+    fasc=asciiout.open_ascii(ascfile)
+  if nprocasc > 1:
+    pool=multiprocessing.Pool(nprocasc)
+  else:
+    pool=None
+# binary data for UB Fortran code
+# the number of stars is written again after all the chunks
+if flagube:
+  if ichunk > 0:
+    fbin=FortranFile('ubgaiaein.bin',mode='r+b')
+    fbin.seek(0,2)
+  else:
+    fbin=FortranFile('ubgaiaein.bin',mode='w')
+    fbin.writeInts(np.reshape(0,1))
 
-# constant for proper motion unit conversion
-pmvconst=4.74047
-# changing the unit from km/s to mas/yr
-# km/s -> arcsec/y   vt=4.74 mu d(pc)
-valps=1000.0*valps/pmvconst/(rads*1000.0)
-vdels=1000.0*vdels/pmvconst/(rads*1000.0)
+# reading the data and selecting apparent magnitude chunk by chunk
+# number of stars of each input file
+nsource=[0]*len(inputfiles)
+ns=0
+if ichunk > 0:
+  ns=state['ns']
+  nsource=state['nsource']
+sels=[]
+# the chunks done before are read again only for ebf output and plot
+if flagebf or flagplot:
+  chunks=galaxia_ingest.ingest(inputfiles,vmaglim,nchunk,nprocin)
+else:
+  chunks=galaxia_ingest.ingest(inputfiles,vmaglim,nchunk,nprocin
+    ,start=ichunk,starid=ns)
+for ic,sel in chunks:
+  if ic < ichunk:
+    sels.append(sel)
+    continue
+  nsc=len(sel['alps'])
+  ns+=nsc
+  if nsc > 0:
+    nsource[sel['source'][0]]+=nsc
 
-# test
-# f=open('vposeq-test.dat','w')
-# i=0
-# while i < ns:
-#  print >>f, "%f %f %f" %(px[i],py[i],pz[i])
-#  print >>f, "%f %f %f %f %f %f %f %f %f %f %f %f %f %f %f %f %f %f" %(poseqs[0,i],poseqs[1,i]
-#   ,poseqs[2,i],veleqs[0,i],veleqs[1,i],veleqs[2,i]
-#   ,alps[i],dels[i],vrads[i],valps[i]
-#   ,vdels[i],rads[i],vxs[i],vys[i],vzs[i],pxs[i],pys[i],pzs[i])
-#  i+=1
-# f.close()
+  if flagubeasc:
+    with runreport.stage('write_ascii') as st:
+      asciiout.write_ascii(fasc,np.column_stack([sel['alps'],sel['dels']
+       ,sel['diss'],sel['valps'],sel['vdels'],sel['vrads'],sel['teffs']
+       ,sel['loggs'],sel['fehs'],sel['avs'],sel['vicoles'],sel['vmages']
+       ,sel['vmages']-sel['vicoles'],sel['glatas'],sel['glonas']])
+       ,fmt='%12.5e',pool=pool)
+      st.add(nsc)
 
+  if flagube:
+    with runreport.stage('write_ubgaiaein') as st:
+      fbin.writeRecordArray(galaxia_ingest.ubgaiaein_records(sel),prec='d')
+      st.add(nsc)
 
-# stellar parameters for selected stars
-ages=age[sindx]
-# age Gyr
-ages=np.power(10.0,age[sindx]-9.0)
-fehs=feh[sindx]
-alfes=alfe[sindx]
-avs=av[sindx]
-vicoles=vicole[sindx]
-mvmags=mvmag[sindx]
-smasss=smass[sindx]
-teffs=teff[sindx]
-# Teff K
-teffs=np.power(10.0,teffs)
-loggs=logg[sindx]
+  # keep the selected stars only for ebf output and plot
+  if flagebf or flagplot:
+    sels.append(sel)
 
-# bolometric magnitude
-mbolsun=4.75
-mbols=-2.5*lum+mbolsun
+  if flagresume:
+    files=[]
+    if flagubeasc:
+      if ascfile.endswith('.gz'):
+        # one gzip member for each chunk, so that the file can be
+        # truncated at the checkpoint
+        fasc.close()
+        fasc=asciiout.open_ascii(ascfile,'a')
+      else:
+        files.append(fasc)
+    if flagube:
+      files.append(fbin)
+    manifest.checkpoint(ic+1,{'ns':ns,'nsource':nsource},files)
 
-# distance in parsec
-diss=rads*1000.0
+print 'Ns(V<',vmaglim,')=',ns
 
-# ASCII data for UB Fortran code
 if flagubeasc:
-  f=open('ubgaiae-in.asc','w')
-  i=0
-  while i < ns:
-    print >>f, " %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e %12.5e" %(alps[i],dels[i],diss[i],valps[i],vdels[i],vrads[i]
-   ,teffs[i],loggs[i],fehs[i],avs[i],vicoles[i],vmages[i],vmages[i]-vicoles[i]
-   ,glatas[i],glonas[i])
-    i+=1
-  f.close()
-
-# binary data for UB Fortran code
+  fasc.close()
+  if pool is not None:
+    pool.close()
 if flagube:
-  f=FortranFile('ubgaiaein.bin',mode='w')
-  nsarr=np.reshape(ns,1)
-  f.writeInts(nsarr)
-  i=0
-  while i < ns:
-    staro=np.array([alps[i],dels[i],diss[i],valps[i],vdels[i],vrads[i]
-      ,teffs[i],loggs[i],fehs[i],avs[i],vicoles[i],vmages[i],ages[i]])
-    f.writeReals(staro,prec='d')
-    i+=1
-  f.close()
+  fbin.seek(0)
+  fbin.writeInts(np.reshape(ns,1))
+  fbin.close()
+  galaxia_ingest.write_sources(sourcefile,inputfiles,nsource)
+
+# the ebf output and the plot are not in the stages of the report
+runreport.finish(reportfile)
+
+if flagebf or flagplot:
+  sel=galaxia_ingest.concatenate(sels)
+  alps=sel['alps']
+  dels=sel['dels']
+  diss=sel['diss']
+  valps=sel['valps']
+  vdels=sel['vdels']
+  ages=sel['ages']
+  fehs=sel['fehs']
+  alfes=sel['alfes']
+  avs=sel['avs']
+  vicoles=sel['vicoles']
+  mvmags=sel['mvmags']
+  vmages=sel['vmages']
+  smasss=sel['smasss']
+  teffs=sel['teffs']
+  loggs=sel['loggs']
+  pxs=sel['pxs']
+  pys=sel['pys']
+  pzs=sel['pzs']
+  glonas=sel['glonas']
+  glatas=sel['glatas']
+  equs=np.vstack([alps,dels])
 
 # ebf output
 if flagebf:
@@ -248,6 +235,8 @@ if flagebf:
   ebf.write(outputfile,'/smass',smasss,'a')
   ebf.write(outputfile,'/Teff',teffs,'a')
   ebf.write(outputfile,'/logg',loggs,'a')
+  ebf.write(outputfile,'/starid',sel['starid'],'a')
+  ebf.write(outputfile,'/source',sel['source'],'a')
 
 if flagplot:
 # test plot
@@ -294,3 +283,6 @@ if flagplot:
 #cb=plt.colorbar()
   plt.show()
   plt.savefig('galaxia-stars.png')
+
+if flagresume:
+  manifest.finish({'ns':ns,'nsource':nsource})
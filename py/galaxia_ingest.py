@@ -0,0 +1,453 @@
+# read galaxia output and select the stars for ubgaiaerrors
+# used by galaxia2ubgaiae.py
+
+"""Selection and coordinate transformation of Galaxia stars.
+
+The Galaxia EBF file is read in chunks of rows, the apparent V magnitude
+with extinction is computed and the stars brighter than the magnitude
+limit are transformed to the equatorial coordinates.  The other datasets
+are read only for the selected stars.
+
+A large galaxia run can be in several EBF files (e.g. one for each
+population or sky region).  ingest processes the chunks of all the files
+with a pool of worker processes and returns the selected stars in the
+order of the files and the chunks, with the global star ID (the index in
+ubgaiaein.bin) and the source (the index of the file) of each star.
+
+Examples
+--------
+
+    >>> for begin, end in chunks(nrows(inputfile), 1000000):
+    ...     sel = read_selected(inputfile, begin, end, 13.0)
+    ...     staro = ubgaiaein_records(sel)
+    >>> inputfiles = input_files('../galaxia/galaxy1-part*.ebf')
+    >>> for ichunk, sel in ingest(inputfiles, 13.0, nproc=8):
+    ...     staro = ubgaiaein_records(sel)
+"""
+
+import glob
+import signal
+import multiprocessing
+import ebf
+import numpy as np
+from runreport import stage
+# transformation matrix from Galactic to equatorial coordinate
+from coords import tmateqga
+
+# datasets needed for the magnitude selection
+selection_datasets = ['rad', 'ubv_v', 'ubv_i', 'exbv_schlegel']
+# datasets read only for the selected stars
+star_datasets = ['px', 'py', 'pz', 'vx', 'vy', 'vz', 'glon', 'glat', 'Age',
+                 'FeH', 'Alpha', 'Smass', 'Teff', 'Grav']
+# datasets read from the galaxia output
+# other datasets (ubv_u, ubv_b, lum, ...) are not used
+datasets = selection_datasets+star_datasets
+
+# columns of ubgaiaein.bin
+ubgaiaein_columns = ['alps', 'dels', 'diss', 'valps', 'vdels', 'vrads',
+                     'teffs', 'loggs', 'fehs', 'avs', 'vicoles', 'vmages',
+                     'ages']
+
+# constant for proper motion unit conversion
+pmvconst = 4.74047
+
+# event of the pool set by ingest when the chunks are no longer needed
+stop = None
+
+
+def nrows(inputfile):
+    """Number of stars in the galaxia output."""
+    return ebf.getHeader(inputfile, '/px').dim[0]
+
+
+def read_center(inputfile):
+    """Solar position and velocity assumed in Galaxia."""
+    return ebf.read(inputfile, '/Center')
+
+
+def input_files(inputfile):
+    """Galaxia output file names.
+
+    Parameters
+    ----------
+    inputfile : string or list
+        file name or glob pattern, or list of them.  The files of a
+        pattern are sorted by name.
+
+    Returns
+    -------
+    list of the file names
+    """
+    if isinstance(inputfile, basestring):
+        inputfile = [inputfile]
+    fnames = []
+    for pattern in inputfile:
+        matches = sorted(glob.glob(pattern))
+        if len(matches) == 0:
+            raise IOError('No galaxia output: %s' % pattern)
+        fnames.extend(matches)
+    return fnames
+
+
+def check_center(inputfiles):
+    """Solar position and velocity of the galaxia outputs.
+
+    ValueError is raised if the files are not of the same galaxia run.
+    """
+    center = read_center(inputfiles[0])
+    for fname in inputfiles[1:]:
+        if not np.array_equal(read_center(fname), center):
+            raise ValueError('%s has a different /Center from %s'
+                             % (fname, inputfiles[0]))
+    return center
+
+
+def chunks(ns, nchunk):
+    """(begin, end) of the chunks of nchunk rows for ns stars."""
+    if nchunk <= 0:
+        nchunk = max(ns, 1)
+    return [(begin, min(begin+nchunk, ns)) for begin in range(0, ns, nchunk)]
+
+
+def read_chunk(inputfile, begin, end, names=datasets):
+    """Read rows begin:end of the datasets."""
+    data = {}
+    for name in names:
+        data[name] = ebf.read(inputfile, '/'+name, begin=begin, end=end)
+    return data
+
+
+def read_rows(inputfile, ind, names=star_datasets):
+    """Read only the rows ind of the datasets.
+
+    The datasets are memory-mapped, so that only the pages with the
+    rows ind are read from the file.
+    """
+    data = {}
+    for name in names:
+        efile = ebf.EbfFile(inputfile, '/'+name, 'r', cache=1)
+        mdata = np.memmap(inputfile, dtype=efile.dtype, mode='r',
+                          offset=efile.datalocation,
+                          shape=(efile.elements,))
+        data[name] = np.array(mdata[ind])
+        if efile.header.flagswap == 1:
+            data[name] = data[name].byteswap(True)
+        del mdata
+        efile.close()
+    return data
+
+
+def vband(data):
+    """Apparent V and V-I with extinction, and Av.
+
+    Returns
+    -------
+    vmage, vicole, av : array
+    """
+    # apparent magnitude
+    dm = 5.0*np.log10(data['rad']*100.0)
+    vmag = data['ubv_v']+dm
+    imag = data['ubv_i']+dm
+    # extinction
+    av = data['exbv_schlegel']*3.315
+    ai = data['exbv_schlegel']*1.940
+    # add extinction
+    vmage = vmag+av
+    image = imag+ai
+    vicole = vmage-image
+    return vmage, vicole, av
+
+
+def galeq(pxs, pys, pzs, vxs, vys, vzs):
+    """Galactic cartesian position (kpc) and velocity (km/s) to
+    R.A., Dec. (degree), distance (kpc), radial velocity (km/s) and
+    proper motions (mas/yr).
+
+    Returns
+    -------
+    alps, dels, rads, vrads, valps, vdels : array
+    """
+    # transfer to equatorial cartesian coordinate
+    poseqs = np.dot(tmateqga, np.vstack([pxs, pys, pzs]))
+    veleqs = np.dot(tmateqga, np.vstack([vxs, vys, vzs]))
+
+    # R.A. Dec.
+    radxys = np.sqrt(np.power(poseqs[0, :], 2)+np.power(poseqs[1, :], 2))
+    rads = np.sqrt(np.power(poseqs[0, :], 2)+np.power(poseqs[1, :], 2)
+                   +np.power(poseqs[2, :], 2))
+    alps = np.degrees(np.arccos(poseqs[0, :]/radxys))
+    alps = np.where(poseqs[1, :] < 0.0, 360.0-alps, alps)
+    dels = np.degrees(np.arcsin(poseqs[2, :]/rads))
+
+    # radial velocity
+    vrads = (veleqs[0, :]*poseqs[0, :]+veleqs[1, :]*poseqs[1, :]
+             +veleqs[2, :]*poseqs[2, :])/rads
+    # proper motion
+    # mu_alpha (km/s)
+    valps = (-veleqs[0, :]*poseqs[1, :]+veleqs[1, :]*poseqs[0, :])/radxys
+    # mu_delta (km/s)
+    # vrad in x-y plane
+    vradxys = (veleqs[0, :]*poseqs[0, :]+veleqs[1, :]*poseqs[1, :])/radxys
+    vdels = (-vradxys*poseqs[2, :]+veleqs[2, :]*radxys)/rads
+    # changing the unit from km/s to mas/yr
+    # km/s -> arcsec/y   vt=4.74 mu d(pc)
+    valps = 1000.0*valps/pmvconst/(rads*1000.0)
+    vdels = 1000.0*vdels/pmvconst/(rads*1000.0)
+    return alps, dels, rads, vrads, valps, vdels
+
+
+def select_index(data, vmaglim):
+    """Indices of the stars with V < vmaglim.
+
+    Returns
+    -------
+    sindx : array
+        indices of the selected stars
+    vmage, vicole, av : array
+        V, V-I and Av of the selected stars
+    """
+    vmage, vicole, av = vband(data)
+    sindx = np.where(vmage < vmaglim)[0]
+    return sindx, vmage[sindx], vicole[sindx], av[sindx]
+
+
+def star_parameters(data, vmages, vicoles, avs):
+    """Parameters of the selected stars.
+
+    Parameters
+    ----------
+    data : dict
+        datasets of the galaxia output only for the selected stars
+    vmages, vicoles, avs : array
+        V, V-I and Av of the selected stars
+
+    Returns
+    -------
+    dict of the arrays of the selected stars, with the names of
+    galaxia2ubgaiae.py (alps, dels, diss, ...)
+    """
+    sel = {}
+    sel['pxs'] = data['px']
+    sel['pys'] = data['py']
+    sel['pzs'] = data['pz']
+    sel['vxs'] = data['vx']
+    sel['vys'] = data['vy']
+    sel['vzs'] = data['vz']
+    sel['glonas'] = data['glon']
+    sel['glatas'] = data['glat']
+    sel['vmages'] = vmages
+    sel['vicoles'] = vicoles
+
+    alps, dels, rads, vrads, valps, vdels = galeq(
+        sel['pxs'], sel['pys'], sel['pzs'],
+        sel['vxs'], sel['vys'], sel['vzs'])
+    sel['alps'] = alps
+    sel['dels'] = dels
+    sel['vrads'] = vrads
+    sel['valps'] = valps
+    sel['vdels'] = vdels
+    # distance in parsec
+    sel['diss'] = rads*1000.0
+
+    # stellar parameters for selected stars
+    # age Gyr
+    sel['ages'] = np.power(10.0, data['Age']-9.0)
+    sel['fehs'] = data['FeH']
+    sel['alfes'] = data['Alpha']
+    sel['avs'] = avs
+    sel['mvmags'] = data['ubv_v']
+    sel['smasss'] = data['Smass']
+    # Teff K
+    sel['teffs'] = np.power(10.0, data['Teff'])
+    sel['loggs'] = data['Grav']
+    return sel
+
+
+def select_stars(data, vmaglim):
+    """Select the stars with V < vmaglim and get their parameters.
+
+    Parameters
+    ----------
+    data : dict
+        datasets of the galaxia output
+    vmaglim : float
+        magnitude limit of apparent V with extinction
+
+    Returns
+    -------
+    dict of the arrays of the selected stars, see star_parameters
+    """
+    sindx, vmages, vicoles, avs = select_index(data, vmaglim)
+    sdata = dict((k, v[sindx]) for k, v in data.items())
+    return star_parameters(sdata, vmages, vicoles, avs)
+
+
+def read_selected(inputfile, begin, end, vmaglim):
+    """Read rows begin:end of the galaxia output and select the stars.
+
+    Only the datasets for the selection are read for all the rows, and
+    the other datasets are read only for the selected stars.
+
+    Returns
+    -------
+    dict of the arrays of the selected stars, see star_parameters
+    """
+    with stage('ebf_read') as st:
+        data = read_chunk(inputfile, begin, end, selection_datasets)
+        st.add(end-begin)
+    with stage('select') as st:
+        sindx, vmages, vicoles, avs = select_index(data, vmaglim)
+        sdata = dict((k, v[sindx]) for k, v in data.items())
+        st.add(end-begin)
+    with stage('ebf_read_selected') as st:
+        sdata.update(read_rows(inputfile, begin+sindx))
+        st.add(len(sindx))
+    with stage('transform') as st:
+        sel = star_parameters(sdata, vmages, vicoles, avs)
+        st.add(len(sindx))
+    return sel
+
+
+def file_chunks(inputfiles, nchunk):
+    """(isource, begin, end) of the chunks of nchunk rows of the files,
+    in the order of the files."""
+    return [(isource, begin, end)
+            for isource, fname in enumerate(inputfiles)
+            for begin, end in chunks(nrows(fname), nchunk)]
+
+
+def init_worker(event):
+    """Set stop in a worker process, which ignores Ctrl-C."""
+    global stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stop = event
+
+
+def select_chunk(args):
+    """read_selected with the source of the stars, for a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        (inputfile, isource, begin, end, vmaglim)
+
+    Returns
+    -------
+    dict of the selected stars, or None after stop is set
+    """
+    if stop is not None and stop.is_set():
+        return None
+    inputfile, isource, begin, end, vmaglim = args
+    sel = read_selected(inputfile, begin, end, vmaglim)
+    sel['source'] = np.empty(len(sel['alps']), dtype=np.int32)
+    sel['source'].fill(isource)
+    return sel
+
+
+def ingest(inputfiles, vmaglim, nchunk=1000000, nproc=1, start=0,
+           starid=0):
+    """Selected stars of the galaxia outputs, chunk by chunk.
+
+    The chunks are read, selected and transformed by nproc worker
+    processes, and returned in the order of file_chunks.
+
+    Parameters
+    ----------
+    inputfiles : list
+        galaxia output file names, see input_files
+    vmaglim : float
+        magnitude limit of apparent V with extinction
+    nchunk : integer, optional
+        number of rows read at once from a galaxia output
+    nproc : integer, optional
+        number of worker processes
+    start : integer, optional
+        index of the first chunk, to skip the chunks done before
+    starid : integer, optional
+        global star ID of the first star of the chunk start
+
+    Yields
+    ------
+    ichunk : integer
+        index of the chunk in file_chunks
+    sel : dict
+        arrays of the selected stars (see star_parameters), with the
+        global star ID 'starid' and the index of the file 'source'
+    """
+    tasks = [(inputfiles[isource], isource, begin, end, vmaglim)
+             for isource, begin, end in file_chunks(inputfiles, nchunk)]
+    if nproc > 1:
+        event = multiprocessing.Event()
+        pool = multiprocessing.Pool(nproc, init_worker, (event,))
+        results = pool.imap(select_chunk, tasks[start:])
+    else:
+        pool = None
+        results = (select_chunk(t) for t in tasks[start:])
+    try:
+        for ichunk, sel in enumerate(results, start):
+            n = len(sel['alps'])
+            sel['starid'] = np.arange(starid, starid+n, dtype=np.int64)
+            starid += n
+            yield ichunk, sel
+    except BaseException:
+        # an error or the consumer stopped (GeneratorExit): the chunks
+        # queued in the pool are skipped, not killed with Pool.terminate,
+        # which hangs on the result queue of a worker killed while sending
+        # its chunk
+        if pool is not None:
+            event.set()
+            pool.close()
+            pool.join()
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+def write_sources(fname, inputfiles, nsource):
+    """Write the sources of the stars of ubgaiaein.bin.
+
+    The stars of a source have consecutive global star IDs, and each line
+    is the source, the first and last+1 star ID and the file name.
+    """
+    f = open(fname, 'w')
+    f.write('# source starid_begin starid_end file\n')
+    begin = 0
+    for isource, (inputfile, n) in enumerate(zip(inputfiles, nsource)):
+        f.write('%d %d %d %s\n' % (isource, begin, begin+n, inputfile))
+        begin += n
+    f.close()
+
+
+def read_sources(fname):
+    """Sources written by write_sources.
+
+    Returns
+    -------
+    list of (begin, end, file name) of the sources
+    """
+    sources = []
+    for line in open(fname):
+        if line.startswith('#'):
+            continue
+        isource, begin, end, inputfile = line.split(None, 3)
+        sources.append((int(begin), int(end), inputfile.rstrip('\n')))
+    return sources
+
+
+def source_column(fname):
+    """Source of each star of ubgaiaein.bin, from the file of
+    write_sources."""
+    sources = read_sources(fname)
+    return np.repeat(np.arange(len(sources), dtype=np.int32),
+                     [end-begin for begin, end, inputfile in sources])
+
+
+def ubgaiaein_records(sel):
+    """(N, 13) array of the ubgaiaein.bin records of the selected stars."""
+    return np.column_stack([sel[c] for c in ubgaiaein_columns])
+
+
+def concatenate(sels):
+    """Join the selected stars of the chunks."""
+    return dict((k, np.concatenate([s[k] for s in sels])) for k in sels[0])
@@ -0,0 +1,196 @@
+# columnar HDF5 output of the gaiaed-out.bin records
+# alternative to the fits file of ubgaiae2fits.py
+
+"""Columnar HDF5 table of the stars with Gaia errors.
+
+Each column of the fitsout.py layouts is a chunked, gzip compressed 1D
+dataset with its unit as an attribute, so that a few columns can be
+read without reading the others.  The rows are appended block by block,
+and each block is a row group with the minimum and maximum of each
+column in rowgroup_min/<column> and rowgroup_max/<column>.  Row groups
+outside a range of values can be skipped with select_rowgroups.  The
+HDF5 chunks have at most nchunk rows and not more than the first block,
+so that a small file or a file written in small blocks is not padded to
+full chunks.
+
+'/' in the column names (e.g. '[Fe/H]_true') is replaced by '_' in the
+dataset names, and the original name is in the 'name' attribute.
+
+Examples
+--------
+
+    >>> fout = Hdf5TableWriter('galaxia_gaiadr2.h5', flagGaiaDR2=True)
+    >>> for rdata in blocks:
+    ...     fout.write(fitsout.to_degree(rdata))
+    >>> fout.close()
+    >>> # column names of the Gaia DR2 layout (see fitsout.py)
+    >>> data = read_columns('galaxia_gaiadr2.h5', ['parallax', 'pmra'])
+"""
+
+import numpy as np
+import h5py
+import fitsout
+from runreport import stage
+
+# maximum number of rows of an HDF5 chunk
+nchunk = 65536
+
+# number of row groups of a chunk of the row group statistics
+nchunk_rowgroup = 64
+
+
+def dataset_name(name):
+    """HDF5 dataset name of the column name."""
+    return name.replace('/', '_')
+
+
+class Hdf5TableWriter(object):
+
+    """Columnar HDF5 table written block by block.
+
+    The interface is the same as fitsout.FitsTableWriter.  With
+    nrows > 0, the file is opened again and the rows are appended after
+    the first nrows rows.
+    """
+
+    def __init__(self, outfile, flagGaiaDR2, precision='double', nrows=0,
+                 nchunk=nchunk, compression='gzip'):
+        """
+        Parameters
+        ----------
+        outfile : string
+            output HDF5 file name
+        flagGaiaDR2 : bool
+            Gaia DR2 format if True, see fitsout.py
+        precision : string, optional
+            precision policy, 'double' or 'compact' (see gaiaeout.py)
+        nrows : integer, optional
+            number of rows already written to outfile.  The rows after
+            them are removed.
+        nchunk : integer, optional
+            maximum number of rows of an HDF5 chunk
+        compression : string, optional
+            HDF5 compression filter, None for no compression
+        """
+        self.flagGaiaDR2 = flagGaiaDR2
+        self.precision = precision
+        self.nchunk = nchunk
+        self.compression = compression
+        if nrows > 0:
+            self._reopen(outfile, nrows)
+            return
+        self.nrows = 0
+        self.nrowgroups = 0
+        self.f = h5py.File(outfile, 'w')
+        self.f.attrs['flagGaiaDR2'] = flagGaiaDR2
+        self.f.attrs['precision'] = precision
+        names = [name for name, unit, src in
+                 fitsout.table_columns(flagGaiaDR2)]
+        self.f.attrs['columns'] = np.array(names)
+        self.f.create_group('rowgroup_min')
+        self.f.create_group('rowgroup_max')
+        # first row of each row group
+        self.f.create_dataset('rowgroup_begin', (0,), dtype='i8',
+                              maxshape=(None,), chunks=(nchunk_rowgroup,))
+        # the column datasets are created by the first write
+        self.created = False
+
+    def _create(self, n):
+        """Create the column datasets with chunks of at most n rows."""
+        gmin = self.f['rowgroup_min']
+        gmax = self.f['rowgroup_max']
+        chunk = max(min(self.nchunk, n), 1)
+        for (name, unit, src), fmt in zip(
+                fitsout.table_columns(self.flagGaiaDR2),
+                fitsout.column_formats(self.flagGaiaDR2, self.precision)):
+            dname = dataset_name(name)
+            dset = self.f.create_dataset(
+                dname, (0,), dtype={'D': 'f8', 'E': 'f4'}[fmt],
+                maxshape=(None,), chunks=(chunk,),
+                compression=self.compression,
+                shuffle=self.compression is not None)
+            dset.attrs['name'] = name
+            dset.attrs['unit'] = unit
+            gmin.create_dataset(dname, (0,), dtype='f8', maxshape=(None,),
+                                chunks=(nchunk_rowgroup,))
+            gmax.create_dataset(dname, (0,), dtype='f8', maxshape=(None,),
+                                chunks=(nchunk_rowgroup,))
+        self.created = True
+
+    def _reopen(self, outfile, nrows):
+        self.f = h5py.File(outfile, 'r+')
+        self.nrows = nrows
+        self.created = True
+        # the row groups starting before nrows, the statistics of the
+        # last one are kept as upper and lower limits
+        begin = self.f['rowgroup_begin'][:]
+        self.nrowgroups = int(np.sum(begin < nrows))
+        self.f['rowgroup_begin'].resize((self.nrowgroups,))
+        for name in self.f.attrs['columns']:
+            dname = dataset_name(name)
+            self.f[dname].resize((nrows,))
+            self.f['rowgroup_min'][dname].resize((self.nrowgroups,))
+            self.f['rowgroup_max'][dname].resize((self.nrowgroups,))
+
+    def _append(self, dset, arr):
+        n = len(dset)
+        dset.resize((n+len(arr),))
+        dset[n:] = arr
+
+    def write(self, rdata):
+        """Append the records with the angles in degree as a row group."""
+        if len(rdata) == 0:
+            return
+        if not self.created:
+            self._create(len(rdata))
+        self._append(self.f['rowgroup_begin'], [self.nrows])
+        with stage('fits_columns') as st:
+            cols = fitsout.column_arrays(rdata, self.flagGaiaDR2)
+            st.add(len(rdata))
+        with stage('hdf5_write') as st:
+            for name, unit, arr in cols:
+                dname = dataset_name(name)
+                self._append(self.f[dname], arr)
+                self._append(self.f['rowgroup_min'][dname],
+                             [np.nanmin(arr)])
+                self._append(self.f['rowgroup_max'][dname],
+                             [np.nanmax(arr)])
+            st.add(len(rdata))
+        self.nrows += len(rdata)
+        self.nrowgroups += 1
+
+    def close(self):
+        """Close the file."""
+        if not self.created:
+            # no rows
+            self._create(1)
+        self.f.attrs['nrows'] = self.nrows
+        self.f.close()
+
+
+def select_rowgroups(fname, name, vmin=-np.inf, vmax=np.inf):
+    """(begin, end) of the row groups which can have vmin <= name <= vmax.
+
+    Only the row group statistics are read.
+    """
+    dname = dataset_name(name)
+    with h5py.File(fname, 'r') as f:
+        begin = f['rowgroup_begin'][:]
+        end = np.append(begin[1:], len(f[dname])).astype(begin.dtype)
+        sel = (f['rowgroup_max'][dname][:] >= vmin) & \
+              (f['rowgroup_min'][dname][:] <= vmax)
+    return zip(begin[sel], end[sel])
+
+
+def read_columns(fname, names, begin=0, end=None):
+    """Read rows begin:end of the columns.
+
+    Returns
+    -------
+    dict of the arrays with the column names
+    """
+    data = {}
+    with h5py.File(fname, 'r') as f:
+        for name in names:
+            data[name] = f[dataset_name(name)][begin:end]
+    return data
@@ -0,0 +1,128 @@
+# counter-based random numbers for each star
+# Philox4x32-10 of Salmon et al. (2011, SC11, Random123)
+
+"""Counter-based random numbers keyed by a seed and star IDs.
+
+The random numbers of a star are a function of (seed, star ID, index of
+the number) only, so they do not depend on the order of the stars, the
+size of the chunks or the number of processes.
+
+Examples
+--------
+
+    >>> rng = StarRandom(1111, np.arange(begin, end))
+    >>> a, ao, ae, p, po, pe, ap, apo, ape = gaia_errors(
+    ...     22.0, 1.0, 1, V, VI, a, ap, rng)
+"""
+
+import numpy as np
+
+_mask32 = np.uint64(0xffffffff)
+_shift32 = np.uint64(32)
+_M0 = np.uint64(0xD2511F53)
+_M1 = np.uint64(0xCD9E8D57)
+_W0 = np.uint64(0x9E3779B9)
+_W1 = np.uint64(0xBB67AE85)
+nrounds = 10
+
+
+def philox4x32(ctr, key):
+    """Philox4x32-10 block function.
+
+    Parameters
+    ----------
+    ctr : array
+        (4, n) counters, 32 bit values in uint64
+    key : array
+        (2,) or (2, n) keys, 32 bit values in uint64
+
+    Returns
+    -------
+    (4, n) random 32 bit values in uint64
+    """
+    c0, c1, c2, c3 = [np.array(c, dtype=np.uint64) for c in ctr]
+    k0 = np.array(key[0], dtype=np.uint64)
+    k1 = np.array(key[1], dtype=np.uint64)
+    for r in range(nrounds):
+        if r > 0:
+            k0 = (k0+_W0) & _mask32
+            k1 = (k1+_W1) & _mask32
+        p0 = _M0*c0
+        p1 = _M1*c2
+        c0, c1, c2, c3 = ((p1 >> _shift32) ^ c1 ^ k0, p1 & _mask32,
+                          (p0 >> _shift32) ^ c3 ^ k1, p0 & _mask32)
+    return np.array([c0, c1, c2, c3])
+
+
+class StarRandom(object):
+
+    """Random generator with a counter-based stream for each star.
+
+    The row i of the arrays generated by the methods is drawn from the
+    stream of starid[i].
+    """
+
+    def __init__(self, seed, starid, stream=0):
+        """
+        Parameters
+        ----------
+        seed : integer
+            global random seed (64 bit)
+        starid : array
+            (n,) stable IDs of the stars (64 bit)
+        stream : integer, optional
+            ID of a separate set of streams for the same stars, e.g.
+            for another realisation
+        """
+        seed = np.uint64(seed)
+        self.key = np.array([seed & _mask32, seed >> _shift32])
+        starid = np.asarray(starid).astype(np.uint64)
+        self.c0 = starid & _mask32
+        self.c1 = starid >> _shift32
+        self.stream = np.uint64(stream)
+
+    def _words(self, nblock):
+        """(n, 4*nblock) random 32 bit values of the stars."""
+        n = len(self.c0)
+        words = np.empty((n, 4*nblock), dtype=np.uint64)
+        c3 = np.zeros(n, dtype=np.uint64)+self.stream
+        for j in range(nblock):
+            c2 = np.zeros(n, dtype=np.uint64)+np.uint64(j)
+            words[:, 4*j:4*j+4] = philox4x32(
+                [self.c0, self.c1, c2, c3], self.key).T
+        return words
+
+    def random_sample(self, size):
+        """Uniform random numbers in [0, 1) with 53 bit resolution.
+
+        Parameters
+        ----------
+        size : tuple
+            (n, k), n is the number of stars
+        """
+        n, k = size
+        if n != len(self.c0):
+            raise ValueError('Number of stars does not match starid')
+        words = self._words((k+1)//2)
+        a = words[:, 0::2] >> np.uint64(5)
+        b = words[:, 1::2] >> np.uint64(6)
+        u = (a.astype(np.float64)*67108864.0+b.astype(np.float64)) \
+            /9007199254740992.0
+        return u[:, :k]
+
+    def standard_normal(self, size):
+        """Normal random numbers (Box-Muller) of the stars.
+
+        Parameters
+        ----------
+        size : tuple
+            (n, k), n is the number of stars
+        """
+        n, k = size
+        u = self.random_sample((n, 2*((k+1)//2)))
+        r = np.sqrt(-2.0*np.log(1.0-u[:, 0::2]))
+        phi = 2.0*np.pi*u[:, 1::2]
+        z = np.empty((n, u.shape[1]))
+        z[:, 0::2] = r*np.cos(phi)
+        z[:, 1::2] = r*np.sin(phi)
+        return z[:, :k]
@@ -0,0 +1,156 @@
+# galaxia output -> Gaia errors -> fits file in memory
+# chains galaxia2ubgaiae.py, ubgaiaein2out.py and ubgaiae2fits.py
+
+"""End-to-end pipeline from the Galaxia EBF file to the FITS table.
+
+The selection (galaxia2ubgaiae.py), the Gaia errors (ubgaiaein2out.py)
+and the FITS output (ubgaiae2fits.py) are chained in memory, without
+writing ubgaiaein.bin, gaiaei-out.bin and gaiaed-out.bin.  The stars are
+numbered in the order of the selection, as in ubgaiaein.bin, so that the
+result is the same as the one of the three scripts with the same seed.
+Only one chunk of stars is kept in memory, and the FITS table is written
+chunk by chunk (fitsout.FitsTableWriter).
+
+Examples
+--------
+
+    >>> ns = run_pipeline('../galaxia/galaxy1.ebf', 'galaxia_gaiadr2.fits',
+    ...                   vmaglim=13.0, month=22.0, CAfactor=1.0, jflag=1)
+    >>> fnames = run_sweep_pipeline('../galaxia/galaxy1.ebf',
+    ...     'galaxia_gaiadr2.fits', [(22.0, 1.0, 1), (60.0, 1.0, 1)])
+"""
+
+import galaxia_ingest
+import fitsout
+from gaia_errors import ubgaiae_errors, ubgaiae_sweep
+from philox import StarRandom
+from ubgaiae_parallel import sweep_files
+
+
+def errors_chunks(ebf_path, vmaglim, month, CAfactor, jflag, seed=1111,
+                  nchunk=1000000, nproc=1):
+    """Gaia errors of the selected stars, chunk by chunk.
+
+    Parameters
+    ----------
+    ebf_path : string or list
+        galaxia output file name, or glob pattern or list of the part
+        files of a galaxia run (see galaxia_ingest.input_files)
+    vmaglim : float
+        magnitude limit of apparent V with extinction
+    month, CAfactor, jflag :
+        see gaia_errors.gaia_errors
+    seed : integer, optional
+        random seed, see ubgaiae_parallel.run_errors
+    nchunk : integer, optional
+        number of rows read at once from the galaxia output
+    nproc : integer, optional
+        number of processes to read and select the chunks, see
+        galaxia_ingest.ingest
+
+    Yields
+    ------
+    (n, 46) array of the gaiaed-out.bin records of the selected stars
+    of each chunk
+    """
+    inputfiles = galaxia_ingest.input_files(ebf_path)
+    # the star ID is the index in ubgaiaein.bin
+    for ichunk, sel in galaxia_ingest.ingest(inputfiles, vmaglim, nchunk,
+                                             nproc):
+        stars = galaxia_ingest.ubgaiaein_records(sel)
+        rng = StarRandom(seed, sel['starid'])
+        yield ubgaiae_errors(stars, month, CAfactor, jflag, rng)
+
+
+def sweep_chunks(ebf_path, vmaglim, configs, seed=1111, nchunk=1000000,
+                 nproc=1):
+    """Gaia errors of the selected stars for the configurations of a
+    sweep, chunk by chunk.
+
+    Parameters
+    ----------
+    configs : list
+        (month, CAfactor, jflag) of the configurations
+    ebf_path, vmaglim, seed, nchunk, nproc :
+        see errors_chunks
+
+    Yields
+    ------
+    (len(configs), n, 46) array of the gaiaed-out.bin records of the
+    selected stars of each chunk
+    """
+    inputfiles = galaxia_ingest.input_files(ebf_path)
+    for ichunk, sel in galaxia_ingest.ingest(inputfiles, vmaglim, nchunk,
+                                             nproc):
+        stars = galaxia_ingest.ubgaiaein_records(sel)
+        rng = StarRandom(seed, sel['starid'])
+        yield ubgaiae_sweep(stars, configs, [rng])[:, 0]
+
+
+def run_pipeline(ebf_path, fits_path, vmaglim=13.0, month=22.0,
+                 CAfactor=1.0, jflag=1, seed=1111, nchunk=1000000,
+                 flagGaiaDR2=True, precision='double', nproc=1):
+    """Select the galaxia stars, add Gaia errors and write a FITS file.
+
+    Parameters
+    ----------
+    ebf_path : string or list
+        galaxia output file name, or glob pattern or list of the part
+        files of a galaxia run (see galaxia_ingest.input_files)
+    fits_path : string
+        output FITS file name
+    vmaglim, month, CAfactor, jflag, seed, nchunk, nproc :
+        see errors_chunks
+    flagGaiaDR2 : bool, optional
+        output with the Gaia DR2 format, see fitsout.py
+    precision : string, optional
+        precision policy of the columns, 'double' or 'compact', see
+        gaiaeout.py
+
+    Returns
+    -------
+    number of stars
+    """
+    # the rows are written chunk by chunk
+    fout = fitsout.FitsTableWriter(fits_path, flagGaiaDR2, precision)
+    for rdata in errors_chunks(ebf_path, vmaglim, month, CAfactor, jflag,
+                               seed=seed, nchunk=nchunk, nproc=nproc):
+        # radian -> degree
+        fout.write(fitsout.to_degree(rdata))
+    fout.close()
+    return fout.nrows
+
+
+def run_sweep_pipeline(ebf_path, fits_path, configs, vmaglim=13.0,
+                       seed=1111, nchunk=1000000, flagGaiaDR2=True,
+                       precision='double', nproc=1):
+    """Select the galaxia stars once and write a FITS file for each
+    configuration of a sweep.
+
+    The table of the configuration (month, CAfactor, jflag) is written to
+    sweep_file(fits_path, month, CAfactor, jflag), and it is the same as
+    the one of run_pipeline with the same seed.  The file names must be
+    different (see sweep_files).
+
+    Parameters
+    ----------
+    configs : list
+        (month, CAfactor, jflag) of the configurations
+    ebf_path, fits_path, vmaglim, seed, nchunk, flagGaiaDR2, precision,
+    nproc :
+        see run_pipeline
+
+    Returns
+    -------
+    list of the FITS file names
+    """
+    fnames = sweep_files(fits_path, configs)
+    fouts = [fitsout.FitsTableWriter(fname, flagGaiaDR2, precision)
+             for fname in fnames]
+    for rdata in sweep_chunks(ebf_path, vmaglim, configs, seed=seed,
+                              nchunk=nchunk, nproc=nproc):
+        for fout, rdatac in zip(fouts, rdata):
+            fout.write(fitsout.to_degree(rdatac))
+    for fout in fouts:
+        fout.close()
+    return fnames
@@ -1,121 +1,54 @@
 
 # To plot distance error vs. distance   
 # Errors are calcualted by a simple error propagation.
+# The binned errors are computed in one pass over gaiaed-out.bin
+# and cached in errstats.npz (see errstats.py)
 
-import ebf
 import math
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
-from scipy import constants as const
-from FortranFile import FortranFile
-import struct
+import errstats
 
 # input parameters
 # for distance vs. error
 # number of bin
 nbin=12
 # number of rmax (kpc)
-rmax=100.0
+rmax=15.0
+# number of bins of the 2D histogram (distance, error)
+gridsize=80
 
 # input file name
 inputfileint='gaiaei-out.bin'
 inputfiledb='gaiaed-out.bin'
-
-# reading ASCIIthe data
-# rdata=np.loadtxt('ubgaiae-out.dat')
-# reading binary data
-f=FortranFile(inputfileint)
-nset=f.readInts()
-print ' input Number of stars =',nset
-f.close()
-f=FortranFile(inputfiledb)
-i=0
-rdata=np.zeros((nset,45))
-while i < nset:
-  rdata[i,:]=f.readReals('d')
-  i+=1
-f.close()
-
-print ' Number of stars=',nset
-# no error data
-alpha=rdata[:,0]
-delta=rdata[:,1]
-parad=rdata[:,2]
-mua=rdata[:,3]
-mud=rdata[:,4]
-vrad=rdata[:,5]
-# error
-alphaerr=rdata[:,12]
-deltaerr=rdata[:,13]
-paraderr=rdata[:,14]
-muaerr=rdata[:,15]
-muderr=rdata[:,16]
-vraderr=rdata[:,17]
-
-# only chose positive parallax and < 100 kpc away
-#sindx=np.where(paradet > 1.0e-5)
-# + parallax error < 100 mus
-#sindx=np.where(np.logical_and(paradet > 1.0e-4,
-# paradeterr/paradet < 0.1))
-
-# get Cartician position in equatorial coordidate
-# mas -> distance in kpc
-dist=1.0/parad
-# x,y,z position from the sun's position
-rxy=dist*np.cos(delta)
-px=rxy*np.cos(alpha)
-py=rxy*np.sin(alpha)
-pz=dist*np.sin(delta)
-# vx,vy,vz
-# arcsec/yr -> km/s
-# constant for proper motion unit conversion
-pmvconst=4.74047
-valpha=pmvconst*mua/parad
-vdelta=pmvconst*mud/parad
-vxy=vrad*np.cos(delta)-vdelta*np.sin(delta)
-vx=vxy*np.cos(alpha)-valpha*np.sin(alpha)
-vy=vxy*np.sin(alpha)+valpha*np.cos(alpha)
-vz=vrad*np.sin(delta)+vdelta*np.cos(delta)
-# error
-# distance mas -> kpc
-#disterr=1.0/(parad+paraderr)
-#disterr=dist-disterr
-# error propagation
-#disterr=np.log10(np.sqrt((1.0/np.power(parad,4))*np.power(paraderr,2)))
-disterr=np.sqrt((1.0/np.power(parad,4))*np.power(paraderr,2))
-# velocity
-valphaerr=pmvconst*muaerr/parad
-vdeltaerr=pmvconst*muderr/parad
-
-# output ascii data for test
-# f=open('detest.dat','w')
-# i=0
-# while i < nset:
-# print >>f, "%f %f %f %f %f %f %f %f %f %f" %(px[i],py[i],pz[i]
-#  ,vx[i],vy[i],vz[i],dist[i],disterr[i]
-#  ,parad[i],paraderr[i])
-# i+=1
-# f.close()
-
-# select 
-sindx=np.where(np.logical_and(dist < 15.0
- ,np.logical_and(disterr < 15.0,disterr > 0.001)))
-# selected particles for plot
-#
-pdist=dist[sindx]
-pdisterr=disterr[sindx]
-#
-print ' nsplot=',len(pdist)
+# jflag of ubgaiaein2out.py (1: mean errors, -1: weighted errors),
+# for the derived columns of gaiaed-out.bin (see derived.py)
+jflag=1
+# cache of the binned errors, used again if gaiaed-out.bin and
+# the bins are the same ('': no cache)
+cachefile='errstats.npz'
+
+# get distance (1/parallax) and its error by error propagation
+# in distance bins and the 2D histogram with
+# 0.001 < distance error < 15 kpc, distance < rmax
+stats=errstats.error_stats(inputfiledb,cachefile,nbin=nbin,rmax=rmax
+  ,nx=gridsize,ny=gridsize,inputfileint=inputfileint,jflag=jflag)
+print ' Number of stars=',stats['nstars']
+print ' nsplot=',stats['disterr_hist2d'].sum()
 
 plt.subplot(111)
 # labes
 plt.xlabel("Distance (kpc)",fontsize=18,fontname="serif")
 plt.ylabel("Distance Error (kpc)",fontsize=18,fontname="serif",style="normal")
-# hexbin plot
-plt.hexbin(pdist,pdisterr,yscale='log',bins='log',gridsize=80,cmap=cm.jet)
-# plot mean
-#plt.errorbar(rmean_r,vrotm_r,yerr=vrotsig_r,fmt='ow')
+# 2D histogram
+plt.pcolormesh(stats['xedges'],stats['disterr_yedges']
+  ,np.log10(stats['disterr_hist2d'].T+1.0),cmap=cm.jet)
+plt.yscale('log')
+# plot median and 16, 84 percentiles
+plt.errorbar(stats['rmid'],stats['disterr_p50']
+  ,yerr=[stats['disterr_p50']-stats['disterr_p16']
+  ,stats['disterr_p84']-stats['disterr_p50']],fmt='ow')
 #plt.axis([pxmin,pxmax,pymin,pymax])
 #plt.axis([0.0,15.0,-3.0,1.2])
 plt.xticks(fontsize=18)
@@ -126,4 +59,3 @@ cb.set_label('Log (Counts/100)')
 #
 plt.show()
 plt.savefig('disterr.png')
-
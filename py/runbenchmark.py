@@ -0,0 +1,26 @@
+# benchmark of the pipeline with synthetic galaxia output
+# (see benchmark.py)
+
+import json
+import benchmark
+
+# numbers of stars of the synthetic galaxia outputs
+# 10**7 and 10**8 stars need about 2 GB and 20 GB of disk space
+sizes=[10**4,10**5,10**6]
+
+# stages to run
+# ingest, transform, fortranio, errors, fits
+stages=benchmark.stages
+
+# directory of the synthetic galaxia outputs and the work files
+workdir='bench'
+
+# results in JSON, to compare with the other runs
+outputfile='benchmark.json'
+
+results=benchmark.run_benchmark(workdir,sizes,stages)
+benchmark.print_results(results)
+
+f=open(outputfile,'w')
+json.dump(results,f,indent=1,sort_keys=True)
+f.close()
@@ -0,0 +1,257 @@
+# timing and memory of the stages of a run
+# used by galaxia2ubgaiae.py, ubgaiaein2out.py and ubgaiae2fits.py
+
+"""Per-stage instrumentation with a JSON run report.
+
+The stages of the code are marked with ``with stage(name) as st:``.  If a
+report has been started with start, the wall time, CPU time, peak
+resident memory, bytes read and written, and the number of stars given
+by st.add(nstars) are added to the stage of the report.  Otherwise stage
+does nothing.  A stage can be entered many times (e.g. once for each
+chunk), and the stages can be nested.
+
+The peak resident memory of a stage is measured by resetting the peak
+(VmHWM) of the process at the start of the stage, which needs Linux
+4.0 or later.  Otherwise it is the peak of the process until the end of
+the stage.  The bytes are from /proc/self/io (rchar, wchar), which
+includes the reads from the page cache, and they are None if it is not
+available.  The stages run by worker processes (nproc > 1) are not
+recorded.
+
+Examples
+--------
+
+    >>> report = start('galaxia2ubgaiae.py', {'vmaglim': 13.0},
+    ...                profilefile='galaxia2ubgaiae.prof')
+    >>> with stage('ingest') as st:
+    ...     sel = read_selected(inputfile, begin, end, vmaglim)
+    ...     st.add(end-begin)
+    >>> finish('galaxia2ubgaiae-report.json')
+"""
+
+import os
+import time
+import json
+import resource
+import cProfile
+
+# active report
+_report = None
+
+
+def _proc_io():
+    """(bytes read, bytes written) of the process, or (None, None)."""
+    try:
+        f = open('/proc/self/io')
+        io = dict(l.split(':') for l in f.read().splitlines())
+        f.close()
+        return int(io['rchar']), int(io['wchar'])
+    except (IOError, KeyError, ValueError):
+        return None, None
+
+
+def _maxrss():
+    """Peak resident memory of the process in bytes."""
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+
+def _hwm():
+    """Peak resident memory since the last reset in bytes."""
+    try:
+        f = open('/proc/self/status')
+        for l in f:
+            if l.startswith('VmHWM:'):
+                f.close()
+                return int(l.split()[1])*1024
+        f.close()
+    except IOError:
+        pass
+    return _maxrss()
+
+
+def _reset_hwm():
+    """Reset the peak resident memory.  Returns False if not possible."""
+    try:
+        f = open('/proc/self/clear_refs', 'w')
+        f.write('5')
+        f.close()
+        return True
+    except IOError:
+        return False
+
+
+class StageRecord(object):
+
+    """Totals of a stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.nstars = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_rss = 0
+
+    def add(self, nstars):
+        """Add the number of stars processed."""
+        self.nstars += int(nstars)
+
+    def as_dict(self):
+        d = dict(self.__dict__)
+        if self.wall > 0.0 and self.nstars > 0:
+            d['stars_per_sec'] = self.nstars/self.wall
+        return d
+
+
+class _NoStage(object):
+
+    """Stage of no report."""
+
+    def add(self, nstars):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_nostage = _NoStage()
+
+
+class _Stage(object):
+
+    """Context of a stage of the active report."""
+
+    def __init__(self, report, name):
+        self.report = report
+        if name not in report.stages:
+            report.stages[name] = StageRecord(name)
+            report.order.append(name)
+        self.rec = report.stages[name]
+
+    def __enter__(self):
+        report = self.report
+        hwm = _hwm()
+        for outer in report.open:
+            outer.peak = max(outer.peak, hwm)
+        self.peak = 0
+        report.hwm_reset = _reset_hwm()
+        report.open.append(self)
+        self.io = _proc_io()
+        self.t0 = time.time()
+        self.c0 = time.clock()
+        return self.rec
+
+    def __exit__(self, *exc):
+        rec = self.rec
+        report = self.report
+        rec.calls += 1
+        rec.wall += time.time()-self.t0
+        rec.cpu += time.clock()-self.c0
+        io = _proc_io()
+        if io[0] is None or rec.bytes_read is None:
+            rec.bytes_read = rec.bytes_written = None
+        else:
+            rec.bytes_read += io[0]-self.io[0]
+            rec.bytes_written += io[1]-self.io[1]
+        hwm = _hwm()
+        report.open.pop()
+        for outer in report.open:
+            outer.peak = max(outer.peak, hwm)
+        rec.peak_rss = max(rec.peak_rss, self.peak, hwm)
+        return False
+
+
+class RunReport(object):
+
+    """Stages of a run."""
+
+    def __init__(self, name, params=None, profilefile=None):
+        """
+        Parameters
+        ----------
+        name : string
+            name of the run, e.g. the script name
+        params : dict, optional
+            parameters of the run written to the report
+        profilefile : string, optional
+            if given, the run is profiled with cProfile and the
+            statistics are dumped to the file
+        """
+        self.name = name
+        self.params = params or {}
+        self.profilefile = profilefile
+        self.stages = {}
+        self.order = []
+        self.open = []
+        self.hwm_reset = False
+        self.t0 = time.time()
+        self.c0 = time.clock()
+        if profilefile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.profile = None
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def as_dict(self):
+        return {'name': self.name,
+                'params': self.params,
+                'start': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                       time.localtime(self.t0)),
+                'host': os.uname()[1],
+                'pid': os.getpid(),
+                'wall': time.time()-self.t0,
+                'cpu': time.clock()-self.c0,
+                'maxrss': _maxrss(),
+                'stage_peak_rss': self.hwm_reset,
+                'stages': [self.stages[n].as_dict() for n in self.order]}
+
+    def write(self, fname):
+        """Write the report to a JSON file (if fname is not empty) and
+        dump the profile.
+        """
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.profilefile)
+        if fname:
+            f = open(fname, 'w')
+            json.dump(self.as_dict(), f, indent=1, sort_keys=True)
+            f.close()
+
+
+def start(name, params=None, profilefile=None):
+    """Start the active report.  See RunReport."""
+    global _report
+    _report = RunReport(name, params, profilefile)
+    return _report
+
+
+def stage(name):
+    """Context of the stage name of the active report.
+
+    ``as`` gives the StageRecord, whose add(nstars) adds the number of
+    stars processed.  It does nothing if no report is active.
+    """
+    if _report is None:
+        return _nostage
+    return _report.stage(name)
+
+
+def finish(fname):
+    """Write the active report to fname and stop it.
+
+    Only the profile is dumped if fname is empty, and nothing is done if
+    no report is active.
+    """
+    global _report
+    if _report is not None:
+        _report.write(fname)
+    _report = None
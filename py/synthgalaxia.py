@@ -0,0 +1,125 @@
+# synthetic galaxia output for tests and benchmarks
+# used by benchmark.py
+
+"""Synthetic Galaxia-like EBF files.
+
+The file has the datasets read by galaxia2ubgaiae.py (galaxia_ingest.py)
+and the other photometric datasets of the Galaxia output, with the same
+names.  The stars are uniform on the sky and in distance, so that the
+file is not a model of the Galaxy, but the fraction of the stars selected
+by the magnitude limit is similar (about 5 % with V < 13 and 20 kpc).
+
+The datasets are written one by one in chunks of stars.  Each random
+variable of a chunk has its own random generator seeded by (seed,
+variable, chunk), so that a dataset can be computed without the others
+and very large files can be written with little memory.  The file is
+the same for the same seed and nchunk.
+
+Examples
+--------
+
+    >>> write_synthetic('galaxy-1e6.ebf', 1000000, seed=5)
+"""
+
+import numpy as np
+import ebf
+
+# number of stars generated at once
+nchunk = 1000000
+
+# maximum distance (kpc)
+rmax = 20.0
+
+# random variables, in the order of their seeds
+_variables = ['l', 'sinb', 'rad', 'vx', 'vy', 'vz', 'Age', 'FeH', 'Alpha',
+              'Smass', 'Teff', 'Grav', 'lum', 'mv', 'exbv_schlegel']
+
+# ubv_* = mv + offset
+_bands = {'ubv_u': 0.8, 'ubv_b': 0.5, 'ubv_v': 0.0, 'ubv_r': -0.4,
+          'ubv_i': -0.8, 'ubv_j': -1.5, 'ubv_h': -1.9, 'ubv_k': -2.0}
+
+# datasets of the file
+datasets = ['px', 'py', 'pz', 'vx', 'vy', 'vz', 'glon', 'glat', 'rad',
+            'Age', 'FeH', 'Alpha', 'Smass', 'Teff', 'Grav', 'lum',
+            'exbv_schlegel']+sorted(_bands)
+
+# solar position (kpc) and velocity (km/s)
+center = np.array([0.0, 0.0, 0.0, 11.1, 239.0, 7.25])
+
+
+def _variable(name, n, seed, ichunk):
+    """Random variable of the chunk ichunk of n stars."""
+    rng = np.random.RandomState([seed, _variables.index(name), ichunk])
+    if name == 'l':
+        return rng.uniform(0.0, 360.0, n)
+    elif name == 'sinb':
+        return rng.uniform(-1.0, 1.0, n)
+    elif name == 'rad':
+        return rng.uniform(0.05, rmax, n)
+    elif name in ('vx', 'vy', 'vz'):
+        return rng.normal(0.0, 40.0, n)
+    elif name == 'Age':
+        # log10(age/yr)
+        return rng.uniform(8.0, 10.1, n)
+    elif name == 'FeH':
+        return rng.normal(-0.2, 0.3, n)
+    elif name == 'Alpha':
+        return rng.uniform(0.0, 0.3, n)
+    elif name == 'Smass':
+        return rng.uniform(0.1, 3.0, n)
+    elif name == 'Teff':
+        # log10(Teff/K)
+        return rng.uniform(3.5, 4.0, n)
+    elif name == 'Grav':
+        return rng.uniform(0.0, 5.0, n)
+    elif name == 'lum':
+        return rng.uniform(-2.0, 3.0, n)
+    elif name == 'mv':
+        return rng.uniform(-3.0, 12.0, n)
+    elif name == 'exbv_schlegel':
+        return rng.uniform(0.0, 1.0, n)
+    raise ValueError('Unknown variable '+name)
+
+
+def synthetic_dataset(name, n, seed=5, ichunk=0):
+    """Dataset name of the chunk ichunk of n stars."""
+    if name in ('px', 'py', 'pz', 'glon', 'glat'):
+        l = np.radians(_variable('l', n, seed, ichunk))
+        sinb = _variable('sinb', n, seed, ichunk)
+        if name == 'glon':
+            return np.degrees(l)
+        elif name == 'glat':
+            return np.degrees(np.arcsin(sinb))
+        r = _variable('rad', n, seed, ichunk)
+        cosb = np.sqrt(1.0-sinb**2)
+        if name == 'px':
+            return r*cosb*np.cos(l)
+        elif name == 'py':
+            return r*cosb*np.sin(l)
+        return r*sinb
+    elif name in _bands:
+        return _variable('mv', n, seed, ichunk)+_bands[name]
+    return _variable(name, n, seed, ichunk)
+
+
+def write_synthetic(fname, ns, seed=5, nchunk=nchunk):
+    """Write a synthetic galaxia output of ns stars.
+
+    Parameters
+    ----------
+    fname : string
+        output EBF file name
+    ns : integer
+        number of stars
+    seed : integer, optional
+        random seed
+    nchunk : integer, optional
+        number of stars generated at once
+    """
+    ebf.write(fname, '/Center', center, 'w')
+    for name in datasets:
+        efile = ebf.EbfFile(fname, '/'+name, 'a')
+        for ichunk, begin in enumerate(range(0, ns, nchunk)):
+            n = min(nchunk, ns-begin)
+            efile.write(synthetic_dataset(name, n, seed, ichunk))
+        efile.close()
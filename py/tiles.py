@@ -0,0 +1,312 @@
+# HEALPix sky tiles of the output catalog
+# used by ubgaiae2fits.py
+
+"""Partition of the stars into HEALPix sky tiles.
+
+The stars are grouped by the HEALPix pixel (NESTED scheme) of their
+true position, (RA_true, DEC_true) or (l, b), at a given order
+(nside = 2**order).  Each tile is written to its own file in a
+directory, with the writer of fitsout.py or hdf5out.py, and an index
+file (tiles-index.txt) lists the pixel, the number of stars and the
+range of the longitude and latitude of the stars of each tile.  A region
+query reads only the index to find the tiles to read, and a tile can be
+regenerated without touching the others.
+
+Examples
+--------
+
+    >>> fout = TileWriter('tiles', flagGaiaDR2=True, order=3)
+    >>> for rdata in blocks:
+    ...     fout.write(fitsout.to_degree(rdata))
+    >>> fout.close()
+    >>> files = select_tiles('tiles', 355.0, 5.0, -5.0, 5.0)
+"""
+
+import os
+import collections
+import numpy as np
+import coords
+import fitsout
+
+# index file name in the tile directory
+indexfile = 'tiles-index.txt'
+
+# maximum number of tile files open at the same time
+maxopen = 256
+
+# number of rows of a tile buffered before they are written at once
+# (hdf5out.nchunk, so that an HDF5 chunk is written in one go)
+nbuffer = 65536
+
+# maximum number of rows buffered in all the tiles
+maxbuffer = 1000000
+
+
+def _spread_bits(v, order):
+    """Put the bits of v at the even bit positions."""
+    r = np.zeros_like(v)
+    for i in range(order):
+        r |= ((v >> i) & 1) << (2*i)
+    return r
+
+
+def ang2pix_nest(order, lon, lat):
+    """HEALPix NESTED pixel of (lon, lat) in degree.
+
+    Parameters
+    ----------
+    order : integer
+        HEALPix order, nside = 2**order
+    lon, lat : array
+        longitude and latitude (degree)
+
+    Returns
+    -------
+    pixel indices (int64)
+    """
+    nside = 1 << order
+    z = np.sin(np.radians(lat))
+    za = np.abs(z)
+    # [0, 4)
+    tt = np.mod(np.radians(lon), 2.0*np.pi)/(0.5*np.pi)
+    tt = np.where(tt >= 4.0, 0.0, tt)
+
+    # equatorial region
+    temp1 = nside*(0.5+tt)
+    temp2 = nside*z*0.75
+    jp = (temp1-temp2).astype(np.int64)
+    jm = (temp1+temp2).astype(np.int64)
+    ifp = jp >> order
+    ifm = jm >> order
+    face_eq = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm+8))
+    ix_eq = jm & (nside-1)
+    iy_eq = nside-(jp & (nside-1))-1
+
+    # polar caps
+    ntt = np.minimum(tt.astype(np.int64), 3)
+    tp = tt-ntt
+    tmp = nside*np.sqrt(3.0*(1.0-za))
+    jp = np.minimum((tp*tmp).astype(np.int64), nside-1)
+    jm = np.minimum(((1.0-tp)*tmp).astype(np.int64), nside-1)
+    north = z >= 0.0
+    face_pol = np.where(north, ntt, ntt+8)
+    ix_pol = np.where(north, nside-jm-1, jp)
+    iy_pol = np.where(north, nside-jp-1, jm)
+
+    eq = za <= 2.0/3.0
+    face = np.where(eq, face_eq, face_pol)
+    ix = np.where(eq, ix_eq, ix_pol)
+    iy = np.where(eq, iy_eq, iy_pol)
+    return (face << (2*order))+_spread_bits(ix, order) \
+        +(_spread_bits(iy, order) << 1)
+
+
+def tile_lonlat(rdata, frame):
+    """True (lon, lat) in degree of the records in 'equatorial' or
+    'galactic' frame.
+    """
+    if frame == 'equatorial':
+        return rdata[:, 0], rdata[:, 1]
+    elif frame == 'galactic':
+        return coords.radec_to_lb(rdata[:, 0], rdata[:, 1])
+    raise ValueError('frame must be equatorial or galactic')
+
+
+def tile_file(outdir, order, pix, ext='.fits'):
+    """File name of the tile, e.g. tiles/tile-3-000123.fits"""
+    return os.path.join(outdir, 'tile-%d-%06d%s' % (order, pix, ext))
+
+
+class TileWriter(object):
+
+    """Output catalog partitioned into HEALPix tiles.
+
+    The stars of a tile are buffered and written when the tile has
+    nbuffer rows, when more than maxbuffer rows are buffered in all the
+    tiles (the largest buffers first), or at close, so that a small tile
+    is written at once.  A writer (fitsout.FitsTableWriter or
+    hdf5out.Hdf5TableWriter) is opened for a tile when its stars are
+    written.  At most maxopen writers are open: the least recently used
+    one is closed when another tile is opened, and it is opened again
+    with its number of rows (nrows of the writer) to append the next
+    stars.
+    """
+
+    def __init__(self, outdir, flagGaiaDR2, order, frame='galactic',
+                 writer=fitsout.FitsTableWriter, ext='.fits',
+                 precision='double', maxopen=None, nbuffer=None,
+                 maxbuffer=None):
+        """
+        Parameters
+        ----------
+        outdir : string
+            directory of the tiles, created if it does not exist
+        flagGaiaDR2 : bool
+            Gaia DR2 format if True, see fitsout.py
+        order : integer
+            HEALPix order of the tiles
+        frame : string, optional
+            'equatorial' (RA_true, DEC_true) or 'galactic' (l, b)
+        writer : class, optional
+            writer of a tile
+        ext : string, optional
+            extension of the tile files
+        precision : string, optional
+            precision policy, 'double' or 'compact' (see gaiaeout.py)
+        maxopen, nbuffer, maxbuffer : integer, optional
+            maximum number of tile files open at the same time, number of
+            rows of a tile written at once and maximum number of rows
+            buffered (the module values if None)
+        """
+        if not os.path.isdir(outdir):
+            os.makedirs(outdir)
+        self.outdir = outdir
+        self.flagGaiaDR2 = flagGaiaDR2
+        self.order = order
+        self.frame = frame
+        self.writer = writer
+        self.ext = ext
+        self.precision = precision
+        if maxopen is None:
+            maxopen = globals()['maxopen']
+        if nbuffer is None:
+            nbuffer = globals()['nbuffer']
+        if maxbuffer is None:
+            maxbuffer = globals()['maxbuffer']
+        self.maxopen = max(maxopen, 1)
+        self.nbuffer = nbuffer
+        self.maxbuffer = maxbuffer
+        self.nrows = 0
+        # open writers, the least recently used first
+        self.tiles = collections.OrderedDict()
+        # number of rows of each tile
+        self.counts = {}
+        # number of rows written to the file of each tile
+        self.written = {}
+        # records not yet written of each tile, and their number in all
+        # the tiles
+        self.buffers = {}
+        self.nbuffered = 0
+        # [lonmin, lonmax, latmin, latmax] of each tile
+        self.bounds = {}
+
+    def write(self, rdata):
+        """Append the records with the angles in degree to their tiles."""
+        lon, lat = tile_lonlat(rdata, self.frame)
+        pix = ang2pix_nest(self.order, lon, lat)
+        isort = np.argsort(pix, kind='mergesort')
+        upix, begin = np.unique(pix[isort], return_index=True)
+        end = np.append(begin[1:], len(isort))
+        for p, b, e in zip(upix, begin, end):
+            ind = isort[b:e]
+            if p not in self.counts:
+                self.counts[p] = 0
+                self.written[p] = 0
+                self.buffers[p] = []
+                self.bounds[p] = [np.inf, -np.inf, np.inf, -np.inf]
+            self.buffers[p].append(rdata[ind])
+            self.counts[p] += len(ind)
+            self.nbuffered += len(ind)
+            bnd = self.bounds[p]
+            bnd[0] = min(bnd[0], lon[ind].min())
+            bnd[1] = max(bnd[1], lon[ind].max())
+            bnd[2] = min(bnd[2], lat[ind].min())
+            bnd[3] = max(bnd[3], lat[ind].max())
+            if self.counts[p]-self.written[p] >= self.nbuffer:
+                self._flush(p)
+        while self.nbuffered > self.maxbuffer:
+            self._flush(max(self.buffers,
+                            key=lambda q: self.counts[q]-self.written[q]))
+        self.nrows += len(rdata)
+
+    def _flush(self, p):
+        """Write the buffered records of the tile p."""
+        if len(self.buffers[p]) == 0:
+            return
+        fout = self._open(p)
+        fout.write(np.concatenate(self.buffers[p]))
+        self.buffers[p] = []
+        self.nbuffered -= fout.nrows-self.written[p]
+        self.written[p] = fout.nrows
+
+    def _open(self, p):
+        """Writer of the tile p, opened again if it was closed."""
+        if p in self.tiles:
+            fout = self.tiles.pop(p)
+        else:
+            if len(self.tiles) >= self.maxopen:
+                q, fq = self.tiles.popitem(last=False)
+                fq.close()
+            fname = tile_file(self.outdir, self.order, p, self.ext)
+            if self.written[p] > 0:
+                fout = self.writer(fname, self.flagGaiaDR2, self.precision,
+                                   nrows=self.written[p])
+            else:
+                fout = self.writer(fname, self.flagGaiaDR2, self.precision)
+        self.tiles[p] = fout
+        return fout
+
+    def close(self):
+        """Write the buffered records, close the tiles and write the
+        index."""
+        for p in sorted(self.buffers):
+            self._flush(p)
+        for p in self.tiles:
+            self.tiles[p].close()
+        self.tiles.clear()
+        write_index(self.outdir, self.order, self.frame, self.ext,
+                    [(p, self.counts[p])+tuple(self.bounds[p])
+                     for p in sorted(self.counts)])
+
+
+def write_index(outdir, order, frame, ext, rows):
+    """Write the index of the tiles.
+
+    Parameters
+    ----------
+    rows : list
+        (pixel, nrows, lonmin, lonmax, latmin, latmax) of the tiles
+    """
+    f = open(os.path.join(outdir, indexfile), 'w')
+    f.write('# order= %d frame= %s ext= %s\n' % (order, frame, ext))
+    f.write('# pixel nrows lonmin lonmax latmin latmax\n')
+    for row in rows:
+        f.write('%d %d %.10f %.10f %.10f %.10f\n' % row)
+    f.close()
+
+
+def read_index(outdir):
+    """Read the index of the tiles.
+
+    Returns
+    -------
+    order, frame, ext, (pixel, nrows, lonmin, lonmax, latmin, latmax)
+    arrays
+    """
+    f = open(os.path.join(outdir, indexfile))
+    words = f.readline().split()
+    f.close()
+    order, frame, ext = int(words[2]), words[4], words[6]
+    data = np.loadtxt(os.path.join(outdir, indexfile), ndmin=2)
+    if len(data) == 0:
+        data = np.zeros((0, 6))
+    return (order, frame, ext, data[:, 0].astype(np.int64),
+            data[:, 1].astype(np.int64), data[:, 2], data[:, 3],
+            data[:, 4], data[:, 5])
+
+
+def select_tiles(outdir, lonmin, lonmax, latmin, latmax):
+    """Files of the tiles with stars in the region.
+
+    The region is lonmin <= lon <= lonmax and latmin <= lat <= latmax
+    in degree in the frame of the tiles.  If lonmin > lonmax, the region
+    crosses lon = 0.  Only the index is read.
+    """
+    order, frame, ext, pix, nrows, lon0, lon1, lat0, lat1 = \
+        read_index(outdir)
+    if lonmin <= lonmax:
+        inlon = (lon1 >= lonmin) & (lon0 <= lonmax)
+    else:
+        inlon = (lon1 >= lonmin) | (lon0 <= lonmax)
+    sel = inlon & (lat1 >= latmin) & (lat0 <= latmax)
+    return [tile_file(outdir, order, p, ext) for p in pix[sel]]
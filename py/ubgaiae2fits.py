@@ -9,7 +9,11 @@ import matplotlib.cm as cm
 from scipy import constants as const
 from FortranFile import FortranFile
 import struct
-from galpy.util import bovy_coords
+import os
+import sys
+import fitsout
+import gaiaeout
+import runreport
 
 # input parameters
 # for distance vs. error
@@ -22,6 +26,17 @@ vmaglim=20.0
 
 # flag to output with GaiaDR2 format
 flagGaiaDR2 = True
+# flag to output columnar HDF5 file instead of fits (see hdf5out.py)
+flaghdf5 = False
+# HEALPix order of the sky tiles (see tiles.py)
+# (-1: no tiles, one output file)
+tileorder = -1
+# tiles in 'galactic' (l,b) or 'equatorial' (RA_true,DEC_true)
+tileframe = 'galactic'
+# precision of the output columns
+# 'double': all the columns in double precision
+# 'compact': only positions and parallaxes in double precision
+precision = 'double'
 
 # input file name
 inputfileint='gaiaei-out.bin'
@@ -31,6 +46,55 @@ if flagGaiaDR2 == False:
     outfile='galaxia_gaia.fits'
 else:
     outfile='galaxia_gaiadr2.fits'
+if flaghdf5 == True:
+    outfile=outfile.replace('.fits','.h5')
+# directory of the tiles
+tiledir=outfile.replace('.fits','').replace('.h5','')+'-tiles'
+
+# number of stars converted and written at once
+# (0: all the stars at once)
+nblock=1000000
+
+# skip the run if the output file is up to date, and continue an
+# interrupted run from the last block written (see checkpoint.py)
+# (only a fits file is continued, the HDF5 file and the tiles are
+# written again)
+flagresume = True
+
+# run report with the time and memory of the stages (see runreport.py)
+# ('': no report)
+reportfile=outfile.replace('.fits','').replace('.h5','')+'-report.json'
+# cProfile statistics ('': no profile)
+profilefile=''
+
+params={'flagGaiaDR2':flagGaiaDR2,'flaghdf5':flaghdf5
+  ,'tileorder':tileorder,'tileframe':tileframe,'precision':precision
+  ,'nblock':nblock}
+# number of blocks done before
+iblock=0
+if flagresume == True:
+  import checkpoint
+  import coords
+  # the outputs are made again when the code changes
+  # (FortranFile is the class here)
+  modules=[__file__,fitsout,gaiaeout,coords,sys.modules['FortranFile']]
+  if flaghdf5 == True:
+    import hdf5out
+    modules.append(hdf5out)
+  if tileorder >= 0:
+    import tiles
+    outputfile=os.path.join(tiledir,tiles.indexfile)
+    modules.append(tiles)
+  else:
+    outputfile=outfile
+  manifest=checkpoint.Manifest('ubgaiae2fits',[inputfileint,inputfiledb]
+    ,[outputfile],params,modules=modules)
+  if manifest.is_done():
+    print outputfile,'is up to date'
+    sys.exit()
+  if nblock > 0 and flaghdf5 == False and tileorder < 0:
+    iblock,state=manifest.resume()
+runreport.start('ubgaiae2fits.py',params,profilefile=profilefile)
 
 # reading ASCIIthe data
 # rdata=np.loadtxt('ubgaiae-out.dat')
@@ -39,191 +103,55 @@ f=FortranFile(inputfileint)
 nset=f.readInts()
 print ' input Number of stars =',nset
 f.close()
-f=FortranFile(inputfiledb)
-i=0
-rdata=np.zeros((nset,46))
-while i < nset:
-  rdata[i,:]=f.readReals('d')
-  i+=1
-f.close()
-
 print ' Number of stars=',nset
-# radian -> degree
-rdata[:,0]=180.0*rdata[:,0]/np.pi
-rdata[:,1]=180.0*rdata[:,1]/np.pi
-rdata[:,6]=180.0*rdata[:,6]/np.pi
-rdata[:,7]=180.0*rdata[:,7]/np.pi
-rdata[:,12]=180.0*rdata[:,12]/np.pi
-rdata[:,13]=180.0*rdata[:,13]/np.pi
 
-# Galactic coordinates
-# True l and b
-RA_true=rdata[:,0]
-DEC_true=rdata[:,1]
-Tllbb=bovy_coords.radec_to_lb(RA_true,DEC_true,degree=True,epoch=2000.0)
-GLON_true=Tllbb[:,0]
-GLAT_true=Tllbb[:,1]
-# True pmGLON, pmGLAT
-pmRA_true=rdata[:,3]
-pmDEC_true=rdata[:,4]
-Tpmllbb=bovy_coords.pmrapmdec_to_pmllpmbb(pmRA_true,pmDEC_true \
-   ,RA_true,DEC_true,degree=True,epoch=2000.0)
-pmGLON_true=Tpmllbb[:,0]
-pmGLAT_true=Tpmllbb[:,1]
-# observed 
-RA_obs=rdata[:,6]
-DEC_obs=rdata[:,7]
-pmRA_obs=rdata[:,9]
-pmDEC_obs=rdata[:,10]
-Tpmllbb=bovy_coords.pmrapmdec_to_pmllpmbb(pmRA_obs,pmDEC_obs \
-   ,RA_true,DEC_true,degree=True,epoch=2000.0)
-pmGLON_obs=Tpmllbb[:,0]
-pmGLAT_obs=Tpmllbb[:,1]
-# error
-e_pmRA=rdata[:,12]
-e_pmDEC=rdata[:,13]
-Tpmllbb=bovy_coords.pmrapmdec_to_pmllpmbb(e_pmRA,e_pmDEC \
-   ,RA_true,DEC_true,degree=True,epoch=2000.0)
-e_pmGLON=Tpmllbb[:,0]
-e_pmGLAT=Tpmllbb[:,1]
-
-# Normal output
-if flagGaiaDR2 == False:
-    tbhdu = pyfits.BinTableHDU.from_columns([\
-  pyfits.Column(name='RA_true',unit='(degree)',format='D',array=rdata[:,0]),\
-  pyfits.Column(name='DEC_true',unit='(degree)',format='D',array=rdata[:,1]),\
-  pyfits.Column(name='Plx_true',unit='(mas)',format='D',array=rdata[:,2]),\
-  pyfits.Column(name='pmRA_true',unit='(mas/yr)',format='D',array=rdata[:,3]),\
-  pyfits.Column(name='pmDEC_true',unit='(mas/yr)',format='D',array=rdata[:,4]),\
-  pyfits.Column(name='HRV_true',unit='(km/s)',format='D',array=rdata[:,5]),\
-# observed
-  pyfits.Column(name='RA_obs',unit='(degree)',format='D',array=rdata[:,6]),\
-  pyfits.Column(name='DEC_obs',unit='(degree)',format='D',array=rdata[:,7]),\
-  pyfits.Column(name='Plx_obs',unit='(mas)',format='D',array=rdata[:,8]),\
-  pyfits.Column(name='pmRA_obs',unit='(mas/yr)',format='D',array=rdata[:,9]),\
-  pyfits.Column(name='pmDEC_obs',unit='(mas/yr)',format='D',array=rdata[:,10]),\
-  pyfits.Column(name='HRV_obs',unit='(km/s)',format='D',array=rdata[:,11]),\
-# error
-  pyfits.Column(name='e_RA',unit='(degree)',format='D',array=rdata[:,12]),\
-  pyfits.Column(name='e_DEC',unit='(degree)',format='D',array=rdata[:,13]),\
-  pyfits.Column(name='e_Plx',unit='(mas)',format='D',array=rdata[:,14]),\
-  pyfits.Column(name='e_pmRA',unit='(mas/yr)',format='D',array=rdata[:,15]),\
-  pyfits.Column(name='e_pmDEC',unit='(mas/yr)',format='D',array=rdata[:,16]),\
-  pyfits.Column(name='e_HRV',unit='(km/s)',format='D',array=rdata[:,17]),\
-# True
-  pyfits.Column(name='G_true',unit='(mag)',format='D',array=rdata[:,18]),\
-  pyfits.Column(name='G_BP_true',unit='(mag)',format='D',array=rdata[:,20]),\
-  pyfits.Column(name='G_RP_true',unit='(mag)',format='D',array=rdata[:,21]),\
-# Observed
-  pyfits.Column(name='G_obs',unit='(mag)',format='D',array=rdata[:,22]),\
-  pyfits.Column(name='G_BP_obs',unit='(mag)',format='D',array=rdata[:,24]),\
-  pyfits.Column(name='G_RP_obs',unit='(mag)',format='D',array=rdata[:,25]),\
-# Error
-  pyfits.Column(name='e_G',unit='(mag)',format='D',array=rdata[:,26]),\
-  pyfits.Column(name='e_G_BP',unit='(mag)',format='D',array=rdata[:,28]),\
-  pyfits.Column(name='e_G_RP',unit='(mag)',format='D',array=rdata[:,29]),\
-# True
-  pyfits.Column(name='Teff_true',unit='(K)',format='D',array=rdata[:,30]),\
-  pyfits.Column(name='logg_true',unit='(dex)',format='D',array=rdata[:,31]),\
-  pyfits.Column(name='[Fe/H]_true',unit='(dex)',format='D',array=rdata[:,32]),\
-  pyfits.Column(name='Av_true',unit='(mag)',format='D',array=rdata[:,33]),\
-# Observed
-  pyfits.Column(name='Teff_obs',unit='(K)',format='D',array=rdata[:,34]),\
-  pyfits.Column(name='logg_obs',unit='(dex)',format='D',array=rdata[:,35]),\
-  pyfits.Column(name='[Fe/H]_obs',unit='(dex)',format='D',array=rdata[:,36]),\
-  pyfits.Column(name='Av_obs',unit='(mag)',format='D',array=rdata[:,37]),\
-# Errors
-  pyfits.Column(name='e_Teff',unit='(K)',format='D',array=rdata[:,38]),\
-  pyfits.Column(name='e_logg',unit='(dex)',format='D',array=rdata[:,39]),\
-  pyfits.Column(name='e_[Fe/H]',unit='(dex)',format='D',array=rdata[:,40]),\
-  pyfits.Column(name='e_Av',unit='(mag)',format='D',array=rdata[:,41]),\
-# V,VI,GRVS,Age
-  pyfits.Column(name='V',unit='(mag)',format='D',array=rdata[:,42]),\
-  pyfits.Column(name='V-I',unit='(mag)',format='D',array=rdata[:,43]),\
-  pyfits.Column(name='G_RVS',unit='(mag)',format='D',array=rdata[:,44]),\
-  pyfits.Column(name='Age',unit='(Gyr)',format='D',array=rdata[:,45]),\
-# GLON and GLAT only true
-  pyfits.Column(name='GLON_true',unit='(degree)',format='D',array=GLON_true),\
-  pyfits.Column(name='GLAT_true',unit='(degree)',format='D',array=GLAT_true),\
-# pmGLON and pmGLAT true
-  pyfits.Column(name='pmGLON_true',unit='(mas/yr)',format='D',\
-                array=pmGLON_true),\
-  pyfits.Column(name='pmGLAT_true',unit='(mas/yr)',format='D',\
-                array=pmGLAT_true),\
-# observed
-  pyfits.Column(name='pmGLON_obs',unit='(mas/yr)',format='D',\
-                array=pmGLON_obs),\
-  pyfits.Column(name='pmGLAT_obs',unit='(mas/yr)',format='D',\
-                array=pmGLAT_obs),\
-# Errors
-  pyfits.Column(name='e_pmGLON',unit='(mas/yr)',format='D',\
-    array=e_pmGLON),\
-  pyfits.Column(name='e_pmGLAT',unit='(mas/yr)',format='D',\
-    array=e_pmGLAT)])
+# precision of gaiaed-out.bin from the length of the records
+precin=gaiaeout.detect_precision(inputfiledb)
+f=FortranFile(inputfiledb)
+if nblock <= 0 and flaghdf5 == False and tileorder < 0:
+  with runreport.stage('read_gaiaed') as st:
+    rdata=gaiaeout.read_gaiaed(f,nset[0],precin)
+    st.add(nset[0])
+  # radian -> degree
+  fitsout.to_degree(rdata)
+  # Galactic coordinates are added and the columns are selected
+  # for the normal output or the GaiaDR2 format (see fitsout.py)
+  with runreport.stage('fits_write') as st:
+    fitsout.write_fits(outfile,rdata,flagGaiaDR2,precision)
+    st.add(nset[0])
 else:
-    # Gaia DR2 format with only obs data
-    tbhdu = pyfits.BinTableHDU.from_columns([\
-  pyfits.Column(name='RA_true',unit='(degree)',format='D',array=rdata[:,0]),\
-  pyfits.Column(name='DEC_true',unit='(degree)',format='D',array=rdata[:,1]),\
-  pyfits.Column(name='Plx_true',unit='(mas)',format='D',array=rdata[:,2]),\
-  pyfits.Column(name='pmRA_true',unit='(mas/yr)',format='D',array=rdata[:,3]),\
-  pyfits.Column(name='pmDEC_true',unit='(mas/yr)',format='D',array=rdata[:,4]),\
-  pyfits.Column(name='HRV_true',unit='(km/s)',format='D',array=rdata[:,5]),\
-# observed
-  pyfits.Column(name='ra',unit='(degree)',format='D',array=rdata[:,6]),\
-  pyfits.Column(name='dec',unit='(degree)',format='D',array=rdata[:,7]),\
-  pyfits.Column(name='parallax',unit='(mas)',format='D',array=rdata[:,8]),\
-  pyfits.Column(name='pmra',unit='(mas/yr)',format='D',array=rdata[:,9]),\
-  pyfits.Column(name='pmdec',unit='(mas/yr)',format='D',array=rdata[:,10]),\
-  pyfits.Column(name='radial_velocity',unit='(km/s)',format='D',array=rdata[:,11]),\
-# error
-  pyfits.Column(name='ra_error',unit='(degree)',format='D',array=rdata[:,12]),\
-  pyfits.Column(name='dec_error',unit='(degree)',format='D',array=rdata[:,13]),\
-  pyfits.Column(name='parallax_error',unit='(mas)',format='D',array=rdata[:,14]),\
-  pyfits.Column(name='pmra_error',unit='(mas/yr)',format='D',array=rdata[:,15]),\
-  pyfits.Column(name='pmdec_error',unit='(mas/yr)',format='D',array=rdata[:,16]),\
-  pyfits.Column(name='radial_velocity_error',unit='(km/s)',format='D',array=rdata[:,17]),\
-# True
-  pyfits.Column(name='G_true',unit='(mag)',format='D',array=rdata[:,18]),\
-  pyfits.Column(name='G_BP_true',unit='(mag)',format='D',array=rdata[:,20]),\
-  pyfits.Column(name='G_RP_true',unit='(mag)',format='D',array=rdata[:,21]),\
-# Observed
-  pyfits.Column(name='phot_g_mean_mag',unit='(mag)',format='D',array=rdata[:,22]),\
-  pyfits.Column(name='phot_bp_mean_mag',unit='(mag)',format='D',array=rdata[:,24]),\
-  pyfits.Column(name='phot_rp_mean_mag',unit='(mag)',format='D',array=rdata[:,25]),\
-# no photometry error, because they should be with flux error
-# True
-  pyfits.Column(name='Teff_true',unit='(K)',format='D',array=rdata[:,30]),\
-  pyfits.Column(name='logg_true',unit='(dex)',format='D',array=rdata[:,31]),\
-  pyfits.Column(name='[Fe/H]_true',unit='(dex)',format='D',array=rdata[:,32]),\
-  pyfits.Column(name='Av_true',unit='(mag)',format='D',array=rdata[:,33]),\
-# Observed
-  pyfits.Column(name='teff_val',unit='(K)',format='D',array=rdata[:,34]),\
-  pyfits.Column(name='a_g_val',unit='(mag)',format='D',array=rdata[:,37]),\
-# no stellar parameter errors
-# V,VI,GRVS,Age
-  pyfits.Column(name='V',unit='(mag)',format='D',array=rdata[:,42]),\
-  pyfits.Column(name='V-I',unit='(mag)',format='D',array=rdata[:,43]),\
-  pyfits.Column(name='G_RVS',unit='(mag)',format='D',array=rdata[:,44]),\
-  pyfits.Column(name='Age',unit='(Gyr)',format='D',array=rdata[:,45]),\
-# GLON and GLAT only true
-  pyfits.Column(name='l',unit='(degree)',format='D',array=GLON_true),\
-  pyfits.Column(name='b',unit='(degree)',format='D',array=GLAT_true),\
-# pmGLON and pmGLAT true
-  pyfits.Column(name='pmGLON_true',unit='(mas/yr)',format='D',\
-                array=pmGLON_true),\
-  pyfits.Column(name='pmGLAT_true',unit='(mas/yr)',format='D',\
-                array=pmGLAT_true),\
-# observed
-  pyfits.Column(name='pmGLON_obs',unit='(mas/yr)',format='D',\
-                array=pmGLON_obs),\
-  pyfits.Column(name='pmGLAT_obs',unit='(mas/yr)',format='D',\
-                array=pmGLAT_obs),\
-# Errors
-  pyfits.Column(name='e_pmGLON',unit='(mas/yr)',format='D',\
-    array=e_pmGLON),\
-  pyfits.Column(name='e_pmGLAT',unit='(mas/yr)',format='D',\
-    array=e_pmGLAT)])
-
-tbhdu.writeto(outfile,clobber=True)
-
+  # the header is written first, and the rows block by block
+  # (each block is a row group of the HDF5 file)
+  if flaghdf5 == True:
+    import hdf5out
+    writer=hdf5out.Hdf5TableWriter
+  else:
+    writer=fitsout.FitsTableWriter
+  if tileorder >= 0:
+    # one file for each tile and tiles-index.txt in tiledir
+    import tiles
+    fout=tiles.TileWriter(tiledir,flagGaiaDR2,tileorder,frame=tileframe
+      ,writer=writer,ext=os.path.splitext(outfile)[1],precision=precision)
+  elif iblock > 0:
+    # the rows of the blocks done before are kept
+    fout=writer(outfile,flagGaiaDR2,precision,nrows=state['nrows'])
+    f.seek(state['nrows']*gaiaeout.gaiaed_dtype(f.ENDIAN,f.HEADER_PREC
+      ,'d',precin).itemsize)
+  else:
+    fout=writer(outfile,flagGaiaDR2,precision)
+  if nblock <= 0:
+    nblock=max(nset[0],1)
+  for ib,begin in enumerate(range(0,nset[0],nblock)):
+    if ib < iblock:
+      continue
+    with runreport.stage('read_gaiaed') as st:
+      rdata=gaiaeout.read_gaiaed(f,min(nblock,nset[0]-begin),precin)
+      st.add(len(rdata))
+    fout.write(fitsout.to_degree(rdata))
+    if flagresume == True and flaghdf5 == False and tileorder < 0:
+      manifest.checkpoint(ib+1,{'nrows':fout.nrows},[fout.f])
+  fout.close()
+f.close()
+if flagresume == True:
+  manifest.finish({'nrows':int(nset[0])})
+runreport.finish(reportfile)
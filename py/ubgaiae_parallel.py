@@ -0,0 +1,292 @@
+# add Gaia errors to ubgaiaein.bin with multiple processes
+# used by ubgaiaein2out.py
+
+"""Sharded Gaia errors for ubgaiaein.bin.
+
+The stars in ubgaiaein.bin are split into shards of consecutive stars.
+Each shard is read and processed by a worker process, and the results
+are written to gaiaed-out.bin in the original order of the stars.  The
+random numbers of each star are drawn from its own counter-based stream
+(philox.StarRandom) keyed by the seed and the index of the star.
+
+Examples
+--------
+
+    >>> run_errors('ubgaiaein.bin', 'gaiaei-out.bin', 'gaiaed-out.bin',
+    ...            22.0, 1.0, 1, seed=1111, nproc=8)
+    >>> run_sweep('ubgaiaein.bin', 'gaiaei-out.bin', 'gaiaed-out.bin',
+    ...           [(22.0, 1.0, 1), (34.0, 1.0, 1), (60.0, 1.0, 1)])
+"""
+
+import os
+import signal
+import multiprocessing
+import numpy as np
+from FortranFile import FortranFile
+from gaia_errors import ubgaiae_sweep
+from gaiaeout import read_nstars, write_gaiaed
+from philox import StarRandom
+from runreport import stage
+
+# number of columns of ubgaiaein.bin
+ncolin = 13
+
+# number of stars in a shard
+nshard = 1000000
+
+# set in the worker processes by init_worker
+stop = None
+
+
+def shards(ns, nshard=nshard):
+    """(begin, end) of the shards of nshard stars for ns stars."""
+    return [(begin, min(begin+nshard, ns)) for begin in range(0, ns, nshard)]
+
+
+def read_shard(fname, begin, end):
+    """Read stars begin:end of ubgaiaein.bin, (end-begin, 13) array."""
+    f = FortranFile(fname)
+    f.readInts()
+    f.skipRecordArray(begin, ncolin, 'd')
+    stars = f.readRecordArray(end-begin, ncolin, 'd')
+    f.close()
+    return stars
+
+
+def realization_file(fname, k):
+    """File name of the k-th realization, e.g. gaiaed-out-002.bin"""
+    root, ext = os.path.splitext(fname)
+    return '%s-%03d%s' % (root, k, ext)
+
+
+def sweep_file(fname, month, CAfactor, jflag):
+    """File name of a configuration of a sweep,
+    e.g. gaiaed-out-m60-ca1-j1.bin"""
+    root, ext = os.path.splitext(fname)
+    return '%s-m%g-ca%g-j%d%s' % (root, month, CAfactor, jflag, ext)
+
+
+def sweep_files(fname, configs):
+    """File names of the configurations of a sweep (see sweep_file).
+
+    ValueError is raised if two configurations have the same file name,
+    e.g. a duplicate or months equal under %g, as one would overwrite
+    the other.
+    """
+    fnames = [sweep_file(fname, *c) for c in configs]
+    for i, f in enumerate(fnames):
+        if f in fnames[:i]:
+            raise ValueError('configurations %s and %s of the sweep have '
+                             'the same file name %s'
+                             % (configs[fnames.index(f)], configs[i], f))
+    return fnames
+
+
+def output_files(outputfiledb, nreal=1, configs=None):
+    """gaiaed-out.bin file names of the configurations of a sweep (or
+    outputfiledb if configs is None) and of the realizations, in the
+    order of the records of sweep_shard."""
+    if configs is None:
+        fnames = [outputfiledb]
+    else:
+        fnames = sweep_files(outputfiledb, configs)
+    if nreal > 1:
+        return [realization_file(fname, k) for fname in fnames
+                for k in range(nreal)]
+    return fnames
+
+
+def init_worker(event):
+    """Initialize a worker process of the pool.
+
+    Ctrl-C is left to the parent process, and the shards are skipped
+    after event is set (see run_sweep).
+    """
+    global stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stop = event
+
+
+def sweep_shard(args):
+    """Gaia errors of a shard for the configurations of a sweep.
+
+    Parameters
+    ----------
+    args : tuple
+        (fname, begin, end, configs, seed, nreal)
+
+    Returns
+    -------
+    (len(configs), nreal, end-begin, 46) array of the gaiaed-out.bin
+    records, or None if the run is stopped
+    """
+    if stop is not None and stop.is_set():
+        return None
+    fname, begin, end, configs, seed, nreal = args
+    with stage('read_ubgaiaein') as st:
+        stars = read_shard(fname, begin, end)
+        st.add(end-begin)
+    # the index of the star in ubgaiaein.bin is the star ID
+    # and the realization k uses the k-th streams
+    with stage('error_model') as st:
+        starid = np.arange(begin, end)
+        rngs = [StarRandom(seed, starid, stream=k) for k in range(nreal)]
+        rdata = ubgaiae_sweep(stars, configs, rngs)
+        st.add(end-begin)
+    return rdata
+
+
+def errors_shard(args):
+    """Gaia errors of a shard.
+
+    Parameters
+    ----------
+    args : tuple
+        (fname, begin, end, month, CAfactor, jflag, seed, nreal)
+
+    Returns
+    -------
+    (nreal, end-begin, 46) array of the gaiaed-out.bin records
+    """
+    fname, begin, end, month, CAfactor, jflag, seed, nreal = args
+    return sweep_shard((fname, begin, end, [(month, CAfactor, jflag)],
+                        seed, nreal))[0]
+
+
+def run_sweep(inputfile, outputfileint, outputfiledb, configs, seed=1111,
+              nproc=1, nshard=nshard, nreal=1, precision='double',
+              manifest=None, fnames=None):
+    """Add Gaia errors to ubgaiaein.bin for several configurations.
+
+    ubgaiaein.bin is read once, and the photometry and the errors are
+    computed once for each shard and scaled for each configuration (see
+    gaia_errors.ubgaiae_sweep).  The records of the configuration
+    (month, CAfactor, jflag) are written to
+    sweep_file(outputfiledb, month, CAfactor, jflag), and they are the
+    same as the ones of run_errors with the same seed.
+
+    Parameters
+    ----------
+    inputfile : string
+        ubgaiaein.bin file name
+    outputfileint, outputfiledb : string
+        gaiaei-out.bin and gaiaed-out.bin file names
+    configs : list
+        (month, CAfactor, jflag) of the configurations, see
+        gaia_errors.gaia_errors
+    seed, nproc, nshard, nreal, precision, manifest :
+        see run_errors.  The memory of a shard is proportional to
+        len(configs)*nreal.
+    fnames : list, optional
+        output file names, the default is output_files(outputfiledb,
+        nreal, configs)
+
+    Returns
+    -------
+    number of stars
+    """
+    ns = read_nstars(inputfile)
+    tasks = [(inputfile, begin, end, configs, seed, nreal)
+             for begin, end in shards(ns, nshard)]
+    # number of shards done before
+    ishard = 0
+    if manifest is not None:
+        ishard, state = manifest.resume()
+        tasks = tasks[ishard:]
+
+    f = FortranFile(outputfileint, mode='w')
+    f.writeInts(np.reshape(ns, 1))
+    f.close()
+
+    # ordered merge
+    if fnames is None:
+        fnames = output_files(outputfiledb, nreal, configs)
+    if ishard > 0:
+        # after the records of the shards done
+        fs = [FortranFile(fname, mode='r+b') for fname in fnames]
+        for f in fs:
+            f.seek(0, 2)
+    else:
+        fs = [FortranFile(fname, mode='w') for fname in fnames]
+    pool = None
+    try:
+        if nproc > 1:
+            event = multiprocessing.Event()
+            pool = multiprocessing.Pool(nproc, init_worker, (event,))
+            results = pool.imap(sweep_shard, tasks)
+        else:
+            results = (sweep_shard(t) for t in tasks)
+        # with nproc > 1, 'errors' is the time waiting for the workers
+        with stage('errors') as st:
+            for rdata in results:
+                n = rdata.shape[2]
+                with stage('write_gaiaed') as stw:
+                    for f, rdatak in zip(fs, rdata.reshape(-1, n, 46)):
+                        write_gaiaed(f, rdatak, precision)
+                    stw.add(n)
+                st.add(n)
+                ishard += 1
+                if manifest is not None:
+                    manifest.checkpoint(ishard, {}, fs)
+    except BaseException:
+        # the shards queued in the pool are skipped, and the workers
+        # finish the shards started (Pool.terminate can hang when a
+        # worker is killed while sending its shard)
+        if pool is not None:
+            event.set()
+            pool.close()
+            pool.join()
+        raise
+    finally:
+        # the records written are kept for the last checkpoint
+        for f in fs:
+            f.close()
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if manifest is not None:
+        manifest.finish({'ns': int(ns)})
+    return ns
+
+
+def run_errors(inputfile, outputfileint, outputfiledb, month, CAfactor,
+               jflag, seed=1111, nproc=1, nshard=nshard, nreal=1,
+               precision='double', manifest=None):
+    """Add Gaia errors to ubgaiaein.bin and write gaiaei/gaiaed-out.bin.
+
+    Parameters
+    ----------
+    inputfile : string
+        ubgaiaein.bin file name
+    outputfileint, outputfiledb : string
+        gaiaei-out.bin and gaiaed-out.bin file names
+    month, CAfactor, jflag :
+        see gaia_errors.gaia_errors
+    seed : integer, optional
+        random seed.  The observed values of a star depend only on seed
+        and its index in inputfile, not on nshard or nproc.
+    nproc : integer, optional
+        number of worker processes
+    nshard : integer, optional
+        number of stars in a shard
+    nreal : integer, optional
+        number of realizations of the observed values.  If nreal > 1,
+        the errors are computed once and the realization k is written
+        to realization_file(outputfiledb, k).
+    precision : string, optional
+        precision policy of the output, 'double' or 'compact', see
+        gaiaeout.py
+    manifest : checkpoint.Manifest, optional
+        manifest of the stage.  A checkpoint is recorded after each
+        shard, and an interrupted run continues from the last
+        checkpoint.  The manifest is complete at the end.
+
+    Returns
+    -------
+    number of stars
+    """
+    return run_sweep(inputfile, outputfileint, outputfiledb,
+                     [(month, CAfactor, jflag)], seed=seed, nproc=nproc,
+                     nshard=nshard, nreal=nreal, precision=precision,
+                     manifest=manifest,
+                     fnames=output_files(outputfiledb, nreal))
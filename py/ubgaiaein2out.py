@@ -0,0 +1,96 @@
+
+# add Gaia errors to ubgaiaein.bin with the numpy version of gaia_errors
+# replace ubgaiaerrors/gaia_errors, and generate the same output files
+
+import ubgaiae_parallel
+import runreport
+
+# *** mission length in months, 60=5 years ***
+# *** 22 months for Gaia DR2 ***
+month=22.0
+# *** Calibration astrometric factor:
+# *** CAfactor=1.0 means no calibration errors added ***
+CAfactor=1.0
+# Introduce Gaia errors
+#  jflag=-1: weighted errors, jflag=1: mean errors
+jflag=1
+# random seed
+seed=1111
+
+# parameter sweep: list of (month, CAfactor, jflag)
+# ([]: only month, CAfactor and jflag above)
+# ubgaiaein.bin is read once and the errors of each configuration are
+# written to gaiaed-out-m<month>-ca<CAfactor>-j<jflag>.bin, e.g.
+# sweep=[(22.0,1.0,1),(34.0,1.0,1),(60.0,1.0,1)]
+# the observed values use the same random numbers for all the
+# configurations
+sweep=[]
+
+# number of realizations of the observed values
+# (nreal > 1: gaiaed-out-000.bin, gaiaed-out-001.bin, ...)
+nreal=1
+
+# precision of gaiaed-out.bin
+# 'double': all the columns in double precision (same as the Fortran code)
+# 'compact': only positions and parallaxes in double precision
+precision='double'
+
+# number of processes
+nproc=1
+# number of stars processed at once by a process
+nshard=1000000
+
+# input file
+inputfile='ubgaiaein.bin'
+# output files
+outputfileint='gaiaei-out.bin'
+outputfiledb='gaiaed-out.bin'
+
+# skip the run if the output files are up to date, and continue an
+# interrupted run from the last shard written (see checkpoint.py)
+flagresume=True
+
+# run report with the time and memory of the stages (see runreport.py)
+# ('': no report)
+# the stages of the worker processes are recorded only with nproc=1
+reportfile='ubgaiaein2out-report.json'
+# cProfile statistics ('': no profile)
+profilefile=''
+
+# the output files do not depend on nproc
+if len(sweep) > 0:
+  params={'sweep':[list(c) for c in sweep]}
+  outputfiles=ubgaiae_parallel.output_files(outputfiledb,nreal,sweep)
+else:
+  params={'month':month,'CAfactor':CAfactor,'jflag':jflag}
+  outputfiles=ubgaiae_parallel.output_files(outputfiledb,nreal)
+params.update({'seed':seed,'nreal':nreal,'precision':precision
+  ,'nshard':nshard})
+manifest=None
+if flagresume:
+  import checkpoint
+  import gaia_errors
+  import gaiaeout
+  import philox
+  import FortranFile
+  # the outputs are made again when the code or the tables change
+  modules=[__file__,ubgaiae_parallel,gaia_errors,gaiaeout,philox,FortranFile
+    ,gaia_errors.gfactorfile,gaia_errors.tablevrfile]
+  manifest=checkpoint.Manifest('ubgaiaein2out',[inputfile]
+    ,[outputfileint]+outputfiles,params,modules=modules)
+
+if manifest is not None and manifest.is_done():
+  print outputfileint,'and',', '.join(outputfiles),'are up to date'
+else:
+  runreport.start('ubgaiaein2out.py',dict(params,nproc=nproc)
+    ,profilefile=profilefile)
+  if len(sweep) > 0:
+    ns=ubgaiae_parallel.run_sweep(inputfile,outputfileint,outputfiledb
+      ,sweep,seed=seed,nproc=nproc,nshard=nshard,nreal=nreal
+      ,precision=precision,manifest=manifest)
+  else:
+    ns=ubgaiae_parallel.run_errors(inputfile,outputfileint,outputfiledb
+      ,month,CAfactor,jflag,seed=seed,nproc=nproc,nshard=nshard
+      ,nreal=nreal,precision=precision,manifest=manifest)
+  print 'Number of Stars=',ns
+  runreport.finish(reportfile)